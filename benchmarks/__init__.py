@@ -0,0 +1 @@
+"""Benchmarks for the upload CLI and API. Run each module with `python -m benchmarks.<name>`."""
@@ -0,0 +1,47 @@
+"""
+Compare two benchmark result files and print every timing that changed.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.05]
+
+Timings are matched by their path in the JSON document; a ratio above 1.0
+means the candidate is slower.
+"""
+import json
+import argparse
+from pathlib import Path
+
+def timings(node, path=()):
+    """Yield (path, median seconds) for every timing block in a result document."""
+    if isinstance(node, dict):
+        if "median" in node and isinstance(node["median"], (int, float)):
+            yield path, node["median"]
+            return
+        for key, value in node.items():
+            yield from timings(value, path + (str(key),))
+    elif isinstance(node, list):
+        for idx, value in enumerate(node):
+            label = idx
+            if isinstance(value, dict) and {"format", "pages", "image_kb", "language"} <= value.keys():
+                label = f"{value['language']}-{value['format']}-{value['pages']}p-{value['image_kb']}kb"
+            yield from timings(value, path + (str(label),))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON files")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.05, help="Hide changes smaller than this fraction")
+    args = parser.parse_args()
+
+    baseline = dict(timings(json.loads(args.baseline.read_text())))
+    candidate = dict(timings(json.loads(args.candidate.read_text())))
+    for path in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[path], candidate[path]
+        ratio = after / before if before else float("inf")
+        if abs(ratio - 1) >= args.threshold:
+            marker = "🔴 slower" if ratio > 1 else "🟢 faster"
+            print(f"{marker} {ratio:6.2f}x  {'/'.join(path)}: {before:.6f}s → {after:.6f}s")
+    for path in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"   only in {'baseline' if path in baseline else 'candidate'}: {'/'.join(path)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Synthetic English/Spanish document corpus for the benchmarks.
+
+PDFs and DOCX files are written directly (no extra dependencies) with a
+configurable number of pages/paragraphs and optional embedded image payloads,
+so parsing cost and file size can be varied independently.
+
+    python -m benchmarks.corpus out_dir --pages 1 20 200 --image-kb 0 2048
+"""
+import os
+import sys
+import json
+import zipfile
+import argparse
+import itertools
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.detectors import BUILTIN_CORPUS
+
+LANGUAGES = ("en", "es")
+WORD_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+def page_texts(language: str, pages: int, sentences_per_page: int = 12):
+    """Cycle through the labelled sentences to fill the requested pages."""
+    sentences = itertools.cycle(BUILTIN_CORPUS[language])
+    return [" ".join(next(sentences) for _ in range(sentences_per_page)) for _ in range(pages)]
+
+def _pdf_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("cp1252", errors="replace")
+
+def write_pdf(path: Path, language: str, pages: int, image_bytes: int = 0):
+    """
+    Minimal PDF with one text page per entry (Helvetica, WinAnsi encoding).
+    image_bytes adds an opaque image XObject to the first page to inflate the file.
+    """
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"}
+    next_id = 4
+    image_ref = b""
+    if image_bytes:
+        side = max(1, int((image_bytes / 3) ** 0.5))
+        data = os.urandom(side * side * 3)
+        objects[next_id] = (b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB"
+                            b" /BitsPerComponent 8 /Length %d >>\nstream\n" % (side, side, len(data))
+                            + data + b"\nendstream")
+        image_ref = b" /XObject << /Im1 %d 0 R >>" % next_id
+        next_id += 1
+
+    kids = []
+    for number, text in enumerate(page_texts(language, pages)):
+        # Wrap the page text into lines of ~90 characters
+        words, lines, line = text.split(), [], ""
+        for word in words:
+            if len(line) + len(word) > 90:
+                lines.append(line)
+                line = ""
+            line += word + " "
+        lines.append(line)
+        content = b"BT /F1 10 Tf 14 TL 40 780 Td " + b" ".join(b"(%s) '" % _pdf_string(l) for l in lines) + b" ET"
+        if image_ref and number == 0:
+            content += b" q 200 0 0 200 40 300 cm /Im1 Do Q"
+        resources = b"<< /Font << /F1 3 0 R >>" + (image_ref if number == 0 else b"") + b" >>"
+        objects[next_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources %s"
+                            b" /Contents %d 0 R >>" % (resources, next_id + 1))
+        objects[next_id + 1] = b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+        kids.append(next_id)
+        next_id += 2
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[object_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    Path(path).write_bytes(bytes(out))
+
+def write_docx(path: Path, language: str, pages: int, image_bytes: int = 0):
+    """
+    Minimal DOCX with one paragraph per page of text.
+    image_bytes adds an incompressible media part, like an embedded photo.
+    """
+    paragraphs = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in page_texts(language, pages))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Default Extension="png" ContentType="image/png"/>'
+            '<Override PartName="/word/document.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        )
+        if image_bytes:
+            # Embedded images come before the text part, as Word often writes them
+            archive.writestr("word/media/image1.png", os.urandom(image_bytes), zipfile.ZIP_STORED)
+        archive.writestr(
+            "word/document.xml",
+            f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{WORD_NS}"><w:body>{paragraphs}</w:body></w:document>'
+        )
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx}
+
+def generate_corpus(root: Path, pages=(1, 20), image_kb=(0,), formats=("pdf", "docx"), copies: int = 1):
+    """
+    Write every combination of language x format x page count x image size
+    under root, and return a list of {path, language, format, pages, image_kb, bytes}.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    documents = []
+    for language, fmt, page_count, kb, copy in itertools.product(LANGUAGES, formats, pages, image_kb, range(copies)):
+        path = root / f"{language}-{page_count}p-{kb}kb-{copy}.{fmt}"
+        WRITERS[fmt](path, language, page_count, kb * 1024)
+        documents.append({"path": str(path), "language": language, "format": fmt, "pages": page_count,
+                          "image_kb": kb, "bytes": path.stat().st_size})
+    return documents
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic English/Spanish PDF and DOCX corpus")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 20, 200])
+    parser.add_argument("--image-kb", type=int, nargs="+", default=[0, 2048])
+    parser.add_argument("--copies", type=int, default=1)
+    args = parser.parse_args()
+    documents = generate_corpus(args.output, args.pages, args.image_kb, copies=args.copies)
+    print(json.dumps(documents, indent=2))
+
+if __name__ == "__main__":
+    main()
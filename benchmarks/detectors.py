@@ -0,0 +1,110 @@
+"""
+Language detector benchmark: accuracy against a labelled corpus, agreement
+with langdetect, and time per sample for every registered detector.
+
+    python -m benchmarks.detectors --output detectors.json
+    python -m benchmarks.detectors --corpus path/to/corpus   # corpus/en/*.txt, corpus/es/*.txt
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from language_detectors import DETECTORS, get_detector
+
+# Short, mixed-register samples in the style of the knowledge base
+BUILTIN_CORPUS = {
+    "en": [
+        "Build an emergency fund before you start investing.",
+        "Your monthly budget should cover rent, food and transport first.",
+        "Compound interest means the returns you earn also start earning returns over time.",
+        "Diversification spreads your money across different assets so that one bad investment does not ruin the whole portfolio.",
+        "Before taking on a loan, compare the annual percentage rate offered by at least three lenders.",
+        "Index funds track a market benchmark and usually charge lower fees than actively managed funds.",
+        "A credit score reflects how reliably you have repaid debts in the past.",
+        "Retirement accounts offer tax advantages, but withdrawing early can trigger penalties.",
+        "Inflation reduces the purchasing power of cash that sits idle in a checking account.",
+        "Set clear financial goals, write them down and review your progress every quarter.",
+        "Paying off high-interest credit card debt is often the best return you can get.",
+        "The mentor should answer calmly, avoid jargon and check that the user understood the explanation.",
+        "Insurance protects your savings from unexpected medical bills or accidents.",
+        "Dollar-cost averaging means investing a fixed amount at regular intervals regardless of price.",
+        "Track every expense for one month to find out where your money actually goes.",
+        "Never share your online banking password with anyone, even if they claim to work for the bank.",
+    ],
+    "es": [
+        "Crea un fondo de emergencia antes de empezar a invertir.",
+        "Tu presupuesto mensual debe cubrir primero el alquiler, la comida y el transporte.",
+        "El interés compuesto significa que los rendimientos que obtienes también generan rendimientos con el tiempo.",
+        "La diversificación reparte tu dinero entre distintos activos para que una mala inversión no arruine toda la cartera.",
+        "Antes de pedir un préstamo, compara la tasa anual que ofrecen al menos tres entidades.",
+        "Los fondos indexados siguen un índice del mercado y suelen cobrar comisiones más bajas que los fondos gestionados.",
+        "La puntuación de crédito refleja con qué fiabilidad has pagado tus deudas en el pasado.",
+        "Las cuentas de jubilación ofrecen ventajas fiscales, pero retirar el dinero antes de tiempo puede generar penalizaciones.",
+        "La inflación reduce el poder adquisitivo del efectivo que permanece inactivo en una cuenta corriente.",
+        "Define metas financieras claras, escríbelas y revisa tu progreso cada trimestre.",
+        "Pagar las deudas de tarjetas de crédito con intereses altos suele ser la mejor rentabilidad posible.",
+        "El mentor debe responder con calma, evitar la jerga y comprobar que el usuario entendió la explicación.",
+        "Un seguro protege tus ahorros frente a gastos médicos inesperados o accidentes.",
+        "Invertir una cantidad fija a intervalos regulares reduce el riesgo de comprar en el peor momento.",
+        "Anota cada gasto durante un mes para descubrir a dónde va realmente tu dinero.",
+        "Nunca compartas la contraseña de tu banca en línea con nadie, aunque digan que trabajan para el banco.",
+    ],
+}
+
+def load_corpus(path: Path) -> dict:
+    """Read <path>/<language code>/*.txt into {code: [text, ...]}."""
+    corpus = {}
+    for language_dir in sorted(p for p in path.iterdir() if p.is_dir()):
+        corpus[language_dir.name] = [f.read_text(encoding="utf-8") for f in sorted(language_dir.glob("*.txt"))]
+    return corpus
+
+def evaluate(name: str, samples: list, reference: list, repeat: int) -> dict:
+    detector = get_detector(name)
+    detector.warm_up()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predictions = [detector.detect(text) for text, _ in samples]
+    elapsed = (time.perf_counter() - start) / (repeat * len(samples))
+
+    correct = sum(p.code == label for p, (_, label) in zip(predictions, samples))
+    agree = sum(p.code == r.code for p, r in zip(predictions, reference))
+    return {
+        "accuracy": correct / len(samples),
+        "agreement_with_langdetect": agree / len(samples),
+        "mean_confidence": sum(p.confidence for p in predictions) / len(samples),
+        "microseconds_per_sample": elapsed * 1e6,
+        "errors": [
+            {"label": label, "predicted": p.code, "text": text[:80]}
+            for p, (text, label) in zip(predictions, samples) if p.code != label
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare language detectors on a labelled corpus")
+    parser.add_argument("--corpus", type=Path, help="Directory with one sub-folder of .txt files per language code")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions over the corpus")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else BUILTIN_CORPUS
+    samples = [(text, label) for label, texts in corpus.items() for text in texts]
+    reference = [get_detector("langdetect").detect(text) for text, _ in samples]
+
+    report = {
+        "benchmark": "detectors",
+        "python": platform.python_version(),
+        "samples": len(samples),
+        "detectors": {name: evaluate(name, samples, reference, args.repeat) for name in DETECTORS},
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Offline benchmark of the upload pipeline: per-stage timings and memory peaks
+for text sampling, language detection and whole-file classification, plus
+end-to-end folder uploads against a local S3 stand-in.
+
+    python -m benchmarks.pipeline --output pipeline.json
+    python -m benchmarks.pipeline --s3 endpoint      # uses AWS_ENDPOINT_URL (e.g. localstack)
+
+S3 stand-ins: "moto" (in-process, needs `pip install moto`), "endpoint"
+(any S3-compatible server from AWS_ENDPOINT_URL) or "none" to skip uploads.
+Compare two result files with `python -m benchmarks.compare old.json new.json`.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BENCHMARK_BUCKET = "upload-benchmark"
+
+def measure(fn, repeat: int, setup=None, trace_memory: bool = True) -> dict:
+    """
+    Median/min/max wall time over `repeat` calls (each preceded by the untimed
+    setup, if any), and the Python heap peak of one extra call.
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    result = {"seconds": {"median": statistics.median(samples), "min": min(samples), "max": max(samples)}}
+    if trace_memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            fn()
+            _, result["peak_memory_bytes"] = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return result
+
+def peak_child_rss_bytes():
+    """Largest resident set of any finished child process so far, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+@contextlib.contextmanager
+def s3_backend(kind: str):
+    """Point boto3 at the chosen S3 stand-in for the duration of the block."""
+    if kind == "moto":
+        from moto import mock_aws
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+        with mock_aws():
+            yield
+    elif kind == "endpoint":
+        if not os.getenv("AWS_ENDPOINT_URL"):
+            raise SystemExit("--s3 endpoint needs AWS_ENDPOINT_URL (e.g. http://localhost:4566 for localstack)")
+        yield
+    else:
+        yield
+
+def stage_benchmarks(documents, repeat: int) -> list:
+    import document_upload
+    from extractors import extract_sample, sniff_format
+    from language_detectors import get_detector
+
+    detector = get_detector()
+    detector.warm_up()
+    results = []
+    for document in documents:
+        path = Path(document["path"])
+        text = extract_sample(path)
+        # Cold classification bypasses the cache; cached classification hits it
+        cold = lambda: detector.detect(extract_sample(path))
+        document_upload.detect_language_details(path)
+        results.append({
+            **{k: document[k] for k in ("language", "format", "pages", "image_kb", "bytes")},
+            "detected": detector.detect(text).code,
+            "stages": {
+                "sniff_format": measure(lambda: sniff_format(path), repeat),
+                "sample_text": measure(lambda: extract_sample(path), repeat),
+                "detect": measure(lambda: detector.detect(text), repeat),
+                "classify_file": measure(cold, repeat),
+                "classify_file_cached": measure(lambda: document_upload.detect_language_details(path), repeat),
+            },
+        })
+    return results
+
+def upload_benchmarks(corpus_dir: Path, repeat: int) -> dict:
+    import document_upload
+    from language_cache import language_cache
+
+    document_upload.BUCKET_NAME = BENCHMARK_BUCKET
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        document_upload.ensure_bucket_exists(BENCHMARK_BUCKET)
+
+    total_bytes = sum(p.stat().st_size for p in corpus_dir.iterdir() if p.is_file())
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        folder = measure(lambda: document_upload.upload_folder_to_s3(str(corpus_dir), "benchmark"), repeat)
+        tier = measure(
+            # A fresh index each time: nothing is skipped as already uploaded
+            lambda: document_upload.upload_tier_folder_with_language_detection(
+                str(corpus_dir), index=document_upload.S3KeyIndex()), repeat,
+            # stage_benchmarks filled the cache; every run must detect from scratch
+            setup=language_cache.clear,
+            # Detection runs in worker processes, out of tracemalloc's sight
+            trace_memory=False)
+    tier["peak_worker_rss_bytes"] = peak_child_rss_bytes()
+    for result in (folder, tier):
+        result["megabytes_per_second"] = total_bytes / result["seconds"]["median"] / 1e6
+    return {"files": sum(1 for p in corpus_dir.iterdir() if p.is_file()), "bytes": total_bytes,
+            "upload_folder_to_s3": folder, "upload_tier_folder_with_language_detection": tier}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction, detection and upload")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 20, 200])
+    parser.add_argument("--image-kb", type=int, nargs="+", default=[0, 2048])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--s3", choices=["moto", "endpoint", "none"], default="moto")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the benchmark's detection cache and document index away from the real ones
+        os.environ["LANG_CACHE_PATH"] = str(Path(workdir) / "language_cache.sqlite3")
+        os.environ["DOC_INDEX_PATH"] = str(Path(workdir) / "doc_index.sqlite3")
+        from benchmarks.corpus import generate_corpus
+        corpus_dir = Path(workdir) / "corpus"
+        documents = generate_corpus(corpus_dir, args.pages, args.image_kb)
+
+        report = {
+            "benchmark": "pipeline",
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "corpus": {"pages": args.pages, "image_kb": args.image_kb, "documents": len(documents)},
+            "documents": stage_benchmarks(documents, args.repeat),
+        }
+        if args.s3 != "none":
+            with s3_backend(args.s3):
+                report["upload"] = upload_benchmarks(corpus_dir, args.repeat)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
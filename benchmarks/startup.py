@@ -0,0 +1,113 @@
+"""
+Startup benchmark: cold import time of the CLI and API modules, API startup
+(warm-up) time, and the latency of the first and second Tier detection
+requests. Every sample runs in a fresh interpreter.
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"import_{module}": time.perf_counter() - start}}))
+"""
+
+# Builds a small English DOCX in memory and times the API through its lifespan
+API_SNIPPET = """
+import io, json, time, zipfile
+start = time.perf_counter()
+import upload_app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+
+body = "".join("<w:p><w:r><w:t>The report explains how the family budget works every month.</w:t></w:r></w:p>"
+               for _ in range(20))
+docx = io.BytesIO()
+with zipfile.ZipFile(docx, "w") as archive:
+    archive.writestr("word/document.xml",
+                     '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                     f"<w:body>{body}</w:body></w:document>")
+
+def request_ms(client, name):
+    start = time.perf_counter()
+    response = client.post("/api/get-upload-url", files={"file": (name, docx.getvalue())}, data={"type": "Tier1"})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+client = TestClient(upload_app.app)
+client.__enter__()
+started = time.perf_counter()
+first = request_ms(client, "first.docx")
+# Same content under another name: served by the detection cache
+second = request_ms(client, "second.docx")
+client.__exit__(None, None, None)
+print(json.dumps({
+    "api_import": imported - start,
+    "api_startup": started - imported,
+    "first_request": first,
+    "second_request": second,
+}))
+"""
+
+def run_snippet(snippet: str, cache_dir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    # A fresh cache per sample, so the first request really parses the document
+    env["LANG_CACHE_PATH"] = str(Path(cache_dir) / f"cache-{os.urandom(4).hex()}.sqlite3")
+    result = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=REPO_ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    # Modules may print status lines; the measurement is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def summarize(samples: list) -> dict:
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "samples": samples,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start and first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    samples = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for _ in range(args.runs):
+            for snippet in (IMPORT_SNIPPET.format(module="document_upload"),
+                            IMPORT_SNIPPET.format(module="upload_app"),
+                            API_SNIPPET):
+                for metric, seconds in run_snippet(snippet, cache_dir).items():
+                    samples.setdefault(metric, []).append(seconds)
+
+    report = {
+        "benchmark": "startup",
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "seconds": {metric: summarize(values) for metric, values in samples.items()},
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
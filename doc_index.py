@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from botocore.exceptions import ClientError
+from s3_client import BUCKET_NAME, get_s3_client
+from sidecars import is_sidecar
+
+# ---------------- Index settings ----------------
+# Local index of uploaded documents; it can always be rebuilt from the bucket.
+# Uploads are recorded as they land, except presigned PUTs: the API only sees those
+# when the client calls /api/complete-upload, so other clients' uploads need a rebuild
+INDEX_PATH = Path(os.getenv("DOC_INDEX_PATH", Path(__file__).parent / ".doc_index.sqlite3"))
+# Staged uploads (see upload_app.py) are transient and never indexed, nor are text sidecars
+STAGING_PREFIX = os.getenv("PROXY_STAGING_PREFIX", "_incoming")
+# Concurrent HEAD requests when a rebuild reads object metadata
+HEAD_WORKERS = int(os.getenv("DOC_INDEX_HEAD_WORKERS", "16"))
+
+# Tier folders carry the language in their prefix: "Tier 2-spanish/report.pdf"
+TIER_KEY_RE = re.compile(r"^(Tier \d+)-([a-z]+)/")
+
+# ---------------- Object metadata ----------------
+# Classified documents carry their detection as S3 user metadata (x-amz-meta-*),
+# so consumers read it with a HEAD request instead of fetching the body
+def detection_metadata(detection) -> dict:
+    """S3 user metadata for a DetectionResult."""
+    metadata = {"language": detection.language, "language-confidence": f"{detection.confidence:.4f}"}
+    if detection.sha256:
+        metadata["sha256"] = detection.sha256
+    if detection.page_count is not None:
+        metadata["page-count"] = str(detection.page_count)
+    if not detection.cached:
+        metadata["extract-ms"] = f"{detection.extract_seconds * 1000:.0f}"
+    return metadata
+
+def parse_metadata(metadata: dict) -> dict:
+    """Index columns from S3 user metadata; missing or malformed values are None."""
+    def number(name, cast):
+        try:
+            return cast(metadata[name])
+        except (KeyError, ValueError):
+            return None
+
+    return {
+        "sha256": metadata.get("sha256"),
+        "confidence": number("language-confidence", float),
+        "page_count": number("page-count", int),
+        "extract_ms": number("extract-ms", float),
+    }
+
+def key_fields(key: str, metadata: dict = None) -> dict:
+    """Folder, tier and language of a key (the language prefix wins over metadata)."""
+    match = TIER_KEY_RE.match(key)
+    return {
+        "folder": key.split("/", 1)[0] if "/" in key else "",
+        "tier": match.group(1) if match else None,
+        "language": match.group(2) if match else (metadata or {}).get("language"),
+    }
+
+# ---------------- SQLite index ----------------
+def is_indexed(key: str) -> bool:
+    return not key.startswith(f"{STAGING_PREFIX}/") and not is_sidecar(key)
+
+COLUMNS = ("key", "folder", "tier", "language", "size", "etag", "last_modified",
+           "sha256", "confidence", "page_count", "extract_ms", "metadata_etag")
+METADATA_COLUMNS = ("sha256", "confidence", "page_count", "extract_ms", "metadata_etag")
+
+class DocumentIndex:
+    """
+    One row per uploaded object: key, folder, tier and language, listing fields
+    (size, ETag, last-modified) and the detection metadata. metadata_etag is the
+    ETag whose metadata was read, so rows with stale metadata can be found.
+    Safe to use from several threads and processes.
+    """
+
+    def __init__(self, path: Path = INDEX_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork, so each process opens its own
+        if self._conn is None or self._conn_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " key TEXT PRIMARY KEY, folder TEXT NOT NULL, tier TEXT, language TEXT,"
+                " size INTEGER, etag TEXT, last_modified REAL NOT NULL,"
+                " sha256 TEXT, confidence REAL, page_count INTEGER, extract_ms REAL, metadata_etag TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_new ON documents (tier, language, last_modified)")
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _upsert(conn, key: str, size: int, etag: str, last_modified: float, metadata: dict = None):
+        row = {"key": key, **key_fields(key, metadata), "size": size, "etag": etag, "last_modified": last_modified}
+        updated = ["folder", "tier", "language", "size", "etag", "last_modified"]
+        if metadata is not None:
+            row.update(parse_metadata(metadata), metadata_etag=etag)
+            updated += METADATA_COLUMNS
+        conn.execute(
+            f"INSERT INTO documents ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})"
+            f" ON CONFLICT(key) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in updated)}",
+            list(row.values()),
+        )
+
+    def record(self, key: str, size: int, etag: str = None, last_modified: float = None, metadata: dict = None):
+        """Record an uploaded object; without metadata, previously read metadata is kept."""
+        if not is_indexed(key):
+            return
+        with self._lock:
+            try:
+                conn = self._connection()
+                self._upsert(conn, key, size, etag and etag.strip('"'),
+                             time.time() if last_modified is None else last_modified, metadata)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"   ⚠️  Document index unavailable: {e}")
+
+    def record_object(self, key: str, bucket: str = None):
+        """Record an object from a HEAD request (listing fields and metadata, never the body)."""
+        head = get_s3_client().head_object(Bucket=bucket or BUCKET_NAME, Key=key)
+        self.record(key, head["ContentLength"], head["ETag"], head["LastModified"].timestamp(), head.get("Metadata", {}))
+
+    def remove(self, keys):
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.executemany("DELETE FROM documents WHERE key = ?", [(key,) for key in keys])
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"   ⚠️  Document index unavailable: {e}")
+
+    def rebuild(self, bucket: str = None, head: bool = False, workers: int = HEAD_WORKERS) -> dict:
+        """
+        Resync the index with one paginated listing of the bucket: listed objects
+        are upserted and rows for vanished keys dropped. With head=True, objects
+        whose metadata was never read for their current ETag get a HEAD request.
+        """
+        bucket = bucket or BUCKET_NAME
+        listed = {}
+        paginator = get_s3_client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket):
+            for obj in page.get("Contents", []):
+                if is_indexed(obj["Key"]):
+                    listed[obj["Key"]] = obj
+
+        with self._lock:
+            conn = self._connection()
+            known = {row["key"] for row in conn.execute("SELECT key FROM documents")}
+            conn.executemany("DELETE FROM documents WHERE key = ?", [(key,) for key in known - listed.keys()])
+            for key, obj in listed.items():
+                self._upsert(conn, key, obj["Size"], obj["ETag"].strip('"'), obj["LastModified"].timestamp())
+            conn.commit()
+            stale = [row["key"] for row in conn.execute(
+                "SELECT key FROM documents WHERE metadata_etag IS NULL OR metadata_etag != etag")]
+
+        headed = 0
+        if head and stale:
+            def read_metadata(key):
+                try:
+                    self.record_object(key, bucket)
+                    return True
+                except ClientError as e:
+                    print(f"   ⚠️  Could not read metadata of {key}: {e}")
+                    return False
+
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(stale)))) as executor:
+                headed = sum(executor.map(read_metadata, stale))
+        return {"listed": len(listed), "removed": len(known - listed.keys()), "stale": len(stale) - headed,
+                "headed": headed}
+
+    def since(self, timestamp: float, tier: str = None, language: str = None, folder: str = None) -> list:
+        """Documents uploaded (last modified) after timestamp, oldest first."""
+        query = "SELECT * FROM documents WHERE last_modified > ?"
+        params = [timestamp]
+        for column, value in (("tier", tier), ("language", language), ("folder", folder)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY last_modified, key", params).fetchall()
+        return [dict(row) for row in rows]
+
+# Shared instance used by the upload paths
+document_index = DocumentIndex()
+
+# ---------------- CLI ----------------
+def parse_since(value: str) -> float:
+    """An ISO date/time (UTC unless it has an offset) as a Unix timestamp."""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query or rebuild the local index of uploaded documents")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="Resync the index from a listing of the bucket")
+    rebuild.add_argument("--head", action="store_true",
+                         help="Also read object metadata (one HEAD per new or changed object)")
+    query = commands.add_parser("since", help="List documents uploaded after a date/time")
+    query.add_argument("when", help="ISO date or date/time, e.g. 2026-10-01 or 2026-10-01T12:00+02:00")
+    query.add_argument("--tier", help='e.g. "Tier 2"')
+    query.add_argument("--language", help="e.g. spanish")
+    query.add_argument("--folder", help='Top-level prefix, e.g. "personality"')
+    query.add_argument("--json", action="store_true", help="Print one JSON object per document")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        print(f"🔄 Rebuilding {INDEX_PATH} from s3://{BUCKET_NAME}")
+        stats = document_index.rebuild(head=args.head)
+        print(f"   ✅ {stats['listed']} object(s) listed, {stats['removed']} removed, "
+              f"{stats['headed']} metadata read, {stats['stale']} without current metadata")
+    else:
+        documents = document_index.since(parse_since(args.when), args.tier, args.language, args.folder)
+        for document in documents:
+            if args.json:
+                print(json.dumps(document))
+            else:
+                modified = datetime.fromtimestamp(document["last_modified"], timezone.utc).isoformat(timespec="seconds")
+                pages = document["page_count"] if document["page_count"] is not None else "?"
+                print(f"{modified}  {document['key']}  ({document['language'] or '-'}, {pages} pages)")
+        if not args.json:
+            print(f"📄 {len(documents)} document(s)")
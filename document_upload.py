@@ -1,11 +1,28 @@
 import os
+import json
+import argparse
+import functools
+import hashlib
+import signal
+import tempfile
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-import boto3
+from typing import NamedTuple, Optional
 from dotenv import load_dotenv
-from botocore.exceptions import ClientError, NoCredentialsError
-from langdetect import detect, LangDetectException, DetectorFactory
-import PyPDF2
-import docx2txt
+from botocore.exceptions import BotoCoreError, ClientError
+from extractors import ExtractionError, get_extractor
+from language_cache import CachedDetection, hash_file, language_cache
+from language_detectors import get_detector
+from metrics import registry, record_detection, STAGE_SECONDS, STAGE_BYTES, FILES, FAILURES
+from folder_watch import open_watcher, watch, WATCH_POLL_INTERVAL
+from doc_index import STAGING_PREFIX, detection_metadata, document_index
+from sidecars import build_sidecar, is_sidecar, sidecar_key, sidecar_matches, upload_sidecar
+from s3_client import (BUCKET_NAME, REGION, RangeBudgetError, S3RangeReader, get_s3_client, ensure_bucket_exists,
+                       ensure_staging_lifecycle, set_max_pool_connections)
+# boto3, PyPDF2 and langdetect are imported on first use: importing this module
+# (e.g. from upload_app.py) should not pay for libraries the caller never touches
 #import warnings
 
 # Suppress warnings
@@ -14,9 +31,7 @@ import docx2txt
 # ---------------- Load environment variables ----------------
 load_dotenv()
 
-# Constants
-BUCKET_NAME = os.getenv('BUCKET_NAME')
-REGION = os.getenv('REGION')
+# Bucket and region come from s3_client (BUCKET_NAME/S3_BUCKET_NAME, REGION/AWS_REGION)
 
 # Define folder mappings for non-tiered folders
 FOLDER_MAPPINGS = {
@@ -27,97 +42,324 @@ FOLDER_MAPPINGS = {
 # Tier folders that need language detection
 TIER_FOLDERS = ["Tier 1", "Tier 2"]
 
-# ---------------- Initialize S3 client ----------------
-try:
-    s3 = boto3.client(
-        "s3",
-        region_name=REGION,
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+# ---------------- Upload concurrency ----------------
+# Number of files uploaded in parallel across all folders
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "8"))
+
+MB = 1024 * 1024
+MULTIPART_THRESHOLD = int(os.getenv("MULTIPART_THRESHOLD_MB", "16")) * MB
+MULTIPART_CHUNKSIZE = int(os.getenv("MULTIPART_CHUNKSIZE_MB", "16")) * MB
+TRANSFER_MAX_CONCURRENCY = int(os.getenv("TRANSFER_MAX_CONCURRENCY", "4"))
+
+# Number of processes classifying tier files (PDF parsing and langdetect are CPU-bound)
+DETECT_WORKERS = int(os.getenv("DETECT_WORKERS", str(os.cpu_count() or 1)))
+
+# Local manifest used by --sync to remember file hashes between runs
+MANIFEST_PATH = Path(os.getenv("UPLOAD_MANIFEST", Path(__file__).parent / ".upload_manifest.json"))
+
+# Per-run JSON summary of stage timings, byte counts and outcomes
+METRICS_PATH = Path(os.getenv("UPLOAD_METRICS_PATH", Path(__file__).parent / "upload_run_metrics.json"))
+
+# ---------------- Transfer settings ----------------
+@functools.lru_cache(maxsize=None)
+def get_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        max_concurrency=TRANSFER_MAX_CONCURRENCY,
+        use_threads=True,
     )
-    print("✅ S3 client initialized successfully")
-except Exception as e:
-    print(f"❌ Failed to initialize S3 client: {e}")
-    raise
-
-def sample_text_from_docs(filepath:str)->str:
-    text=docx2txt.process(filepath)
-    return text[:500] if len(text)>500 else text
-
-def sample_text_from_pdf(filepath:str)->str:
-    with open(filepath,'rb') as file:
-        text=""
-        fhand=PyPDF2.PdfReader(file)
-        pages=fhand.pages[:4] if len(fhand.pages)>4 else fhand.pages
-        for page in pages:
-            text += page.extract_text() or ""
-    return text #if len(text)>500 else text
-
-# ---------------- Language Detection with Langdetect ----------------
+
+# ---------------- Warm-up ----------------
+def warm_up():
+    """
+    Import the parsing libraries and load the language detector (including
+    langdetect's profiles) up front, so the first document does not pay for
+    them. Used as the initializer of detection worker processes and at API startup.
+    """
+    import PyPDF2
+    get_detector().warm_up()
+
+# ---------------- Language Detection ----------------
+class DetectionResult(NamedTuple):
+    language: str       # 'spanish' or 'english'
+    code: str           # language code reported by the detector, '' if detection failed
+    confidence: float
+    cached: bool        # True if served from the content-hash cache
+    extract_seconds: float = 0.0    # time spent sampling text (0 on a cache hit)
+    detect_seconds: float = 0.0     # time spent in the detector (0 on a cache hit)
+    sha256: str = ""                # content hash ('' for file-like sources, which are not hashed)
+    page_count: Optional[int] = None    # pages or slides, None if unknown
+
+def language_from_code(lang_code: str, filepath) -> str:
+    # Map language codes to our categories
+    if lang_code == 'es':  # Spanish
+        return "spanish"
+    elif lang_code == 'en':  # English
+        return "english"
+    else:
+        # If detected language is neither English nor Spanish, 
+        # default to English
+        print(f"   ⚠️  Detected '{lang_code}' for '{filepath}', defaulting to English")
+        return "english"
+
+def detect_language_details(filepath) -> DetectionResult:
+    """
+    Detect a file's language with its confidence.
+    Results are cached by content hash and detector, so a file seen before (by
+    the CLI or the API) is not parsed again while LANGUAGE_DETECTOR stays the
+    same. An open file-like object (such as an S3RangeReader) is classified
+    without hashing, so it is never cached.
+    """
+    if not hasattr(filepath, "read"):
+        filepath = Path(filepath)
+    # Sniff the content first, so unsupported files are rejected before being hashed or parsed
+    extractor = get_extractor(filepath)
+    digest = hash_file(filepath) if isinstance(filepath, Path) else None
+    cache_key = f"{get_detector().name}:{digest}" if digest else None
+    cached = language_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        # Entries cached before page counts were recorded still lack one
+        page_count = cached.pages if cached.pages is not None else extractor.page_count(filepath)
+        return DetectionResult(language_from_code(cached.code, filepath), cached.code, cached.confidence, True,
+                               sha256=digest, page_count=page_count)
+
+    start = time.perf_counter()
+    text = extractor.extract(filepath)
+    extract_seconds = time.perf_counter() - start
+    page_count = extractor.page_count(filepath)
+    result = detect_language_from_text(text, filepath)._replace(
+        extract_seconds=extract_seconds, sha256=digest or "", page_count=page_count)
+    if result.code and cache_key:
+        language_cache.put(cache_key, CachedDetection(result.code, result.confidence, page_count))
+    return result
+
+def detect_language_from_text(text: str, source) -> DetectionResult:
+    """Classify an already extracted text sample (source only names the document in warnings)."""
+    start = time.perf_counter()
+    # Use the configured detector (LANGUAGE_DETECTOR) to predict language
+    detection = get_detector().detect(text)
+    detect_seconds = time.perf_counter() - start
+    if not detection.code:
+        print(f"   ⚠️  Could not detect language for '{source}', defaulting to English")
+        return DetectionResult("english", "", 0.0, False, detect_seconds=detect_seconds)
+    return DetectionResult(language_from_code(detection.code, source), detection.code, detection.confidence, False,
+                           detect_seconds=detect_seconds)
+
+def detect_s3_object_language(key: str, download: bool = True) -> DetectionResult:
+    """
+    Classify an object already in S3. Ranged reads fetch only what the
+    extractor touches (PDF trailer and first pages, zip central directory and
+    one member); a document that needs more than S3_RANGE_MAX_MB of them (a
+    scanned PDF going to OCR) is downloaded whole instead. With download=False
+    the RangeBudgetError is raised, for callers that size the download first.
+    """
+    try:
+        with S3RangeReader(key) as reader:
+            return detect_language_details(reader)
+    except RangeBudgetError as e:
+        if not download:
+            raise
+        print(f"   ℹ️  {e}; downloading the whole object")
+    return detect_downloaded_s3_object(key)
+
+def detect_downloaded_s3_object(key: str) -> DetectionResult:
+    """Classify an object in S3 from a full download to a temp file."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(key).suffix) as spool:
+        temp_path = Path(spool.name)
+    try:
+        get_s3_client().download_file(BUCKET_NAME, key, str(temp_path), Config=get_transfer_config())
+        return detect_language_details(temp_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
 def detect_language_from_file(filepath: str) -> str:
     """
-    Detect if a file content is in Spanish or English using langdetect.
+    Detect if a file content is in Spanish or English.
     Returns: 'spanish' or 'english'
     """
-    DetectorFactory.seed = 0
-    # Get file extension and clean the filename
-    file_ext = filepath.suffix
+    return detect_language_details(filepath).language
 
-    # Use langdetect to predict language
+# ---------------- Concurrent upload engine ----------------
+def upload_file_to_s3(file_path: Path, s3_key: str, index: "S3KeyIndex" = None, etag: str = None,
+                      metadata: dict = None) -> bool:
+    """
+    Upload a single file with the tuned transfer config, with optional S3 user metadata.
+    The ETag, if known (sync mode), is recorded in the index with the upload,
+    and the object is recorded in the document index.
+    Returns True on success, False on failure.
+    """
+    # upload_file reports S3 errors as S3UploadFailedError; boto3 is loaded by the time it runs
+    from boto3.exceptions import S3UploadFailedError
     try:
-        absolute_path=filepath.parent/filepath.name
-        if file_ext==".pdf":
-            pdf_text=sample_text_from_pdf(absolute_path)
-            lang_code = detect(pdf_text)
-        else:
-            docx_text=sample_text_from_docs(absolute_path)
-            lang_code = detect(docx_text)
-        # Map language codes to our categories
-        if lang_code == 'es':  # Spanish
-            return "spanish"
-        elif lang_code == 'en':  # English
-            return "english"
-        else:
-            # If detected language is neither English nor Spanish, 
-            # default to English
-            print(f"   ⚠️  Detected '{lang_code}' for '{filepath}', defaulting to English")
-            return "english"
-    except LangDetectException as e:
-        print(f"   ⚠️  Error detecting language for '{filepath}': {e}, defaulting to English")
-        return "english"
+        with STAGE_SECONDS.time(source="cli", stage="transfer"):
+            get_s3_client().upload_file(str(file_path), BUCKET_NAME, s3_key, Config=get_transfer_config(),
+                                        ExtraArgs={"Metadata": metadata} if metadata else None)
+        size = file_path.stat().st_size
+        STAGE_BYTES.inc(size, source="cli", stage="transfer")
+        FILES.inc(source="cli", outcome="uploaded")
+        if index is not None:
+            index.add(s3_key, size=size, etag=etag)
+        document_index.record(s3_key, size, etag, metadata=metadata)
+        return True
+    except (S3UploadFailedError, BotoCoreError, ClientError, OSError) as e:
+        # One failed file is counted and reported, without aborting the rest of the run
+        print(f"   ❌ Failed to upload {file_path.name}: {e}")
+        FAILURES.inc(source="cli", stage="transfer")
+        FILES.inc(source="cli", outcome="failed")
+        return False
+
+def sync_sidecar(file_path: Path, s3_key: str, sha256: str, detect_executor: ProcessPoolExecutor) -> bool:
+    """
+    Upload the text sidecar of an uploaded document (see sidecars.py) unless the
+    one in S3 was built from the same content. The text is extracted on the
+    detection pool. Returns True if a sidecar was uploaded.
+    """
+    key = sidecar_key(s3_key)
+    try:
+        if sidecar_matches(key, sha256):
+            return False
+        with STAGE_SECONDS.time(source="cli", stage="sidecar"):
+            path, format, pages = detect_executor.submit(build_sidecar, file_path).result()
+            try:
+                upload_sidecar(path, key, sha256, format, pages, get_transfer_config())
+            finally:
+                path.unlink(missing_ok=True)
+        return True
+    except Exception as e:
+        # The document itself is uploaded: a parser or S3 error only costs its sidecar
+        print(f"   ⚠️  No text sidecar for {file_path.name}: {e}")
+        FAILURES.inc(source="cli", stage="sidecar")
+        return False
 
-# ---------------- Ensure bucket exists ----------------
-def ensure_bucket_exists():
+def run_uploads(tasks, executor: ThreadPoolExecutor = None):
+    """
+    Run callables on a bounded pool of upload workers.
+    Yields (task_index, result) as each task completes.
+    If no executor is given, a private one with UPLOAD_WORKERS threads is used.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
     try:
-        buckets = [b["Name"] for b in s3.list_buckets()["Buckets"]]
-        if BUCKET_NAME not in buckets:
-            print(f"ℹ️  Bucket '{BUCKET_NAME}' not found. Creating it...")
-            if REGION == "eu-west-1":
-                s3.create_bucket(Bucket=BUCKET_NAME)
-            else:
-                s3.create_bucket(
-                    Bucket=BUCKET_NAME,
-                    CreateBucketConfiguration={"LocationConstraint": REGION},
-                )
-            print(f"✅ Bucket '{BUCKET_NAME}' created successfully.")
-        else:
-            print(f"✅ Bucket '{BUCKET_NAME}' already exists.")
-    except NoCredentialsError:
-        print("❌ AWS credentials not found. Check your .env file.")
-        raise
-    except ClientError as e:
-        print(f"❌ Error checking/creating bucket: {e}")
-        raise
+        futures = {executor.submit(task): idx for idx, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+# ---------------- Incremental sync ----------------
+def compute_s3_etag(file_path: Path, config=None) -> str:
+    """
+    Compute the ETag S3 assigns to a file uploaded with the given transfer config:
+    the MD5 of the body below the multipart threshold, otherwise the MD5 of the
+    concatenated part MD5s followed by "-<part count>".
+    Note: buckets encrypted with SSE-KMS do not use MD5 ETags, so files there never match.
+    """
+    from s3transfer.utils import ChunksizeAdjuster
+    config = config or get_transfer_config()
+    size = file_path.stat().st_size
+    read_size = 1 * MB
+    with open(file_path, "rb") as f:
+        if size < config.multipart_threshold:
+            digest = hashlib.md5()
+            while chunk := f.read(read_size):
+                digest.update(chunk)
+            return digest.hexdigest()
+
+        part_size = ChunksizeAdjuster().adjust_chunksize(config.multipart_chunksize, size)
+        part_digests = []
+        remaining = size
+        while remaining > 0:
+            digest = hashlib.md5()
+            to_read = min(part_size, remaining)
+            while to_read > 0:
+                chunk = f.read(min(read_size, to_read))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                to_read -= len(chunk)
+            part_digests.append(digest.digest())
+            remaining -= part_size
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+class UploadManifest:
+    """
+    Local record of file path → (size, mtime, ETag), persisted as JSON.
+    Files whose size and mtime are unchanged since the last run are not re-hashed.
+    """
+
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self._entries = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            self._entries = {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not read manifest '{self.path}': {e} - Starting fresh")
+            self._entries = {}
+
+    def etag(self, file_path: Path) -> str:
+        """Return the S3-style ETag of a local file, hashing it only if it changed."""
+        stat = file_path.stat()
+        entry_key = str(file_path.resolve())
+        with self._lock:
+            entry = self._entries.get(entry_key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["etag"]
+
+        etag = compute_s3_etag(file_path)
+        with self._lock:
+            self._entries[entry_key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "etag": etag}
+        return etag
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._entries, indent=2, sort_keys=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(data)
+        os.replace(tmp_path, self.path)
+
+def select_changed_files(files, candidate_keys, manifest: UploadManifest, index: "S3KeyIndex",
+                         executor: ThreadPoolExecutor = None):
+    """
+    Return the files whose local ETag matches none of their candidate S3 keys.
+    candidate_keys(file_path) lists every key the file may already live under.
+    Hashing runs on the upload workers.
+    """
+    def is_changed(file_path):
+        try:
+            local_etag = manifest.etag(file_path)
+        except FileNotFoundError:
+            # Deleted since it was listed (e.g. within the watcher's debounce window)
+            return False
+        for key in candidate_keys(file_path):
+            obj = index.get(key)
+            if obj and obj["etag"] == local_etag:
+                return False
+        return True
+
+    tasks = [lambda file_path=file_path: is_changed(file_path) for file_path in files]
+    changed = {idx for idx, is_new in run_uploads(tasks, executor) if is_new}
+    return [file_path for idx, file_path in enumerate(files) if idx in changed]
 
 # ---------------- Upload all files in folder ----------------
-def upload_folder_to_s3(local_folder_name: str, s3_prefix: str):
+def upload_folder_to_s3(local_folder_name: str, s3_prefix: str, executor: ThreadPoolExecutor = None,
+                        index: "S3KeyIndex" = None, manifest: UploadManifest = None, files=None):
+    """
+    Upload every file in a folder (or only the given files of it) under s3_prefix.
+    With a manifest (sync mode), only new or changed files are uploaded.
+    """
     local_folder = Path(__file__).parent/local_folder_name
     
     if not local_folder.exists():
         print(f"⚠️  Folder not found: {local_folder} - Skipping...")
         return 0
     
-    files = list(local_folder.glob("*.*"))
+    files = list(local_folder.glob("*.*")) if files is None else list(files)
     if not files:
         print(f"⚠️  No files found in folder: {local_folder} - Skipping...")
         return 0
@@ -126,26 +368,47 @@ def upload_folder_to_s3(local_folder_name: str, s3_prefix: str):
     print(f"\n📁 Processing folder: {local_folder_name}/")
     print(f"   → S3 prefix: {s3_prefix}/")
     
-    for file_path in files:
-        if file_path.is_file():
-            # Create S3 key with the specified prefix
-            s3_key = f"{s3_prefix}/{file_path.name}"
-            
-            try:
-                s3.upload_file(str(file_path), BUCKET_NAME, s3_key)
-                print(f"   ✅ Uploaded: {file_path.name} → s3://{BUCKET_NAME}/{s3_key}")
-                uploaded_count += 1
-            except (ClientError, NoCredentialsError) as e:
-                print(f"   ❌ Failed to upload {file_path.name}: {e}")
+    files = [file_path for file_path in files if file_path.is_file()]
+    if manifest is not None:
+        if index is None:
+            index = S3KeyIndex().load([s3_prefix])
+        changed_files = select_changed_files(
+            files, lambda file_path: [f"{s3_prefix}/{file_path.name}"], manifest, index, executor
+        )
+        print(f"   ⏭️  Skipping {len(files) - len(changed_files)} unchanged file(s)")
+        FILES.inc(len(files) - len(changed_files), source="cli", outcome="skipped")
+        files = changed_files
+
+    # Create S3 key with the specified prefix
+    tasks = [
+        lambda file_path=file_path: upload_file_to_s3(
+            file_path, f"{s3_prefix}/{file_path.name}", index, manifest.etag(file_path) if manifest else None
+        )
+        for file_path in files
+    ]
+    for idx, ok in run_uploads(tasks, executor):
+        if ok:
+            print(f"   ✅ Uploaded: {files[idx].name} → s3://{BUCKET_NAME}/{s3_prefix}/{files[idx].name}")
+            uploaded_count += 1
     
     print(f"   📦 Uploaded {uploaded_count}/{len(files)} file(s) from '{local_folder_name}/'")
     return uploaded_count
 
 # ---------------- Upload Tier folder with language detection ----------------
-def upload_tier_folder_with_language_detection(tier_folder_name: str):
+def upload_tier_folder_with_language_detection(tier_folder_name: str, executor: ThreadPoolExecutor = None,
+                                                index: "S3KeyIndex" = None, manifest: UploadManifest = None,
+                                                detect_executor: ProcessPoolExecutor = None, files=None,
+                                                sidecars: bool = False):
     """
-    Upload files from a tier folder, automatically detecting language
-    and uploading to appropriate S3 prefix (e.g., Tier1-spanish, Tier1-english)
+    Upload files from a tier folder (or only the given files of it), automatically detecting language
+    and uploading to appropriate S3 prefix (e.g., Tier1-spanish, Tier1-english).
+    Files already present under either language prefix are skipped; pass a
+    pre-loaded index to avoid listing the prefixes again. With a manifest
+    (sync mode), files are compared by content so edited files are re-uploaded.
+
+    Detection runs on a process pool and each file is handed to the upload
+    workers as soon as its language is known, so parsing and transfer overlap.
+    With sidecars, the full text of each uploaded file is stored next to it.
     """
     local_folder  = Path(__file__).parent/tier_folder_name
     
@@ -153,7 +416,7 @@ def upload_tier_folder_with_language_detection(tier_folder_name: str):
         print(f"⚠️  Folder not found: {local_folder} - Skipping...")
         return 0, 0
     
-    files = list(local_folder.glob("*.*"))
+    files = list(local_folder.glob("*.*")) if files is None else list(files)
     if not files:
         print(f"⚠️  No files found in folder: {local_folder} - Skipping...")
         return 0, 0
@@ -163,62 +426,215 @@ def upload_tier_folder_with_language_detection(tier_folder_name: str):
     
     print(f"\n📁 Processing tier folder: {tier_folder_name}/")
 
-    s3_files=list()
-    for lang in ["spanish", "english"]:
-        prefix = f"{tier_folder_name}-{lang}"
-        s3_files+=list_s3_files_by_prefix(prefix)
+    prefixes = [f"{tier_folder_name}-{lang}" for lang in ["spanish", "english"]]
+    if index is None:
+        index = S3KeyIndex().load(prefixes)
         
-    cleaned_s3_files={file.split('/',1)[1] for file in s3_files}
-    unique_files=[file for file in files if file.name not in cleaned_s3_files]
+    if manifest is not None:
+        files = [file for file in files if file.is_file()]
+        unique_files = select_changed_files(
+            files, lambda file_path: [f"{prefix}/{file_path.name}" for prefix in prefixes],
+            manifest, index, executor
+        )
+        print(f"   ⏭️  Skipping {len(files) - len(unique_files)} unchanged file(s)")
+    else:
+        cleaned_s3_files=set().union(*(index.names(prefix) for prefix in prefixes))
+        unique_files=[file for file in files if file.name not in cleaned_s3_files and file.is_file()]
+    FILES.inc(len(files) - len(unique_files), source="cli", outcome="skipped")
 
-    for file_path in unique_files:
-        if file_path.is_file():
-            
-            # Detect language from filename using langdetect
-            language = detect_language_from_file(file_path)
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+    own_detect_executor = detect_executor is None and bool(unique_files)
+    if own_detect_executor:
+        detect_executor = ProcessPoolExecutor(max_workers=min(DETECT_WORKERS, len(unique_files)),
+                                              initializer=warm_up)
+    
+    try:
+        # Stage 1: classify files on all cores
+        detect_futures = {
+            detect_executor.submit(detect_language_details, file_path): file_path
+            for file_path in unique_files
+        }
+        # Stage 2: upload each file as soon as its language is known
+        upload_futures = {}
+        cache_hits = 0
+        for future in as_completed(detect_futures):
+            file_path = detect_futures[future]
+            try:
+                detection = future.result()
+            except ExtractionError as e:
+                print(f"   ❌ Skipping {file_path.name}: {e}")
+                FAILURES.inc(source="cli", stage="extract")
+                FILES.inc(source="cli", outcome="failed")
+                continue
+            except Exception as e:
+                print(f"   ❌ Failed to detect language for {file_path.name}: {e}")
+                FAILURES.inc(source="cli", stage="detect")
+                FILES.inc(source="cli", outcome="failed")
+                continue
+            record_detection(detection, "cli")
+            language = detection.language
+            cache_hits += detection.cached
             
             # Determine S3 prefix based on tier and language
-            s3_prefix = f"{tier_folder_name}-{language}"
-            s3_key = f"{s3_prefix}/{file_path.name}"
+            s3_key = f"{tier_folder_name}-{language}/{file_path.name}"
+            etag = manifest.etag(file_path) if manifest else None
+            upload_futures[executor.submit(upload_file_to_s3, file_path, s3_key, index, etag,
+                                           detection_metadata(detection))] = (file_path, language, detection.sha256)
+        
+        sidecar_futures = []
+        for future in as_completed(upload_futures):
+            if not future.result():
+                continue
+            file_path, language, sha256 = upload_futures[future]
+            if sidecars:
+                s3_key = f"{tier_folder_name}-{language}/{file_path.name}"
+                sidecar_futures.append(executor.submit(sync_sidecar, file_path, s3_key, sha256, detect_executor))
+            print(f"   ✅ [{language.upper()}] {file_path.name} → s3://{BUCKET_NAME}/{tier_folder_name}-{language}/{file_path.name}")
             
-            try:
-                s3.upload_file(str(file_path), BUCKET_NAME, s3_key)
-                print(f"   ✅ [{language.upper()}] {file_path.name} → s3://{BUCKET_NAME}/{s3_key}")
-                
-                if language == "spanish":
-                    spanish_count += 1
-                else:
-                    english_count += 1
-                    
-            except (ClientError, NoCredentialsError) as e:
-                print(f"   ❌ Failed to upload {file_path.name}: {e}")
+            if language == "spanish":
+                spanish_count += 1
+            else:
+                english_count += 1
+        
+        if detect_futures:
+            print(f"   🗃️  Detection cache: {cache_hits} hit(s), {len(detect_futures) - cache_hits} parsed")
+        if sidecar_futures:
+            written = sum(future.result() for future in sidecar_futures)
+            print(f"   📝 Text sidecars: {written} uploaded, {len(sidecar_futures) - written} up to date or failed")
+    finally:
+        if own_detect_executor:
+            detect_executor.shutdown(wait=True)
+        if own_executor:
+            executor.shutdown(wait=True)
     
     total = spanish_count + english_count
     print(f"   📦 Uploaded {total} file(s): {spanish_count} Spanish, {english_count} English")
     return spanish_count, english_count
 
 # ---------------- List uploaded files (verification) ----------------
+def iter_s3_objects(prefix: str):
+    """
+    Yield every object under a prefix, fetching one page of
+    list_objects_v2 (up to 1000 keys) at a time.
+    """
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        yield from page.get("Contents", [])
+
 def list_s3_files_by_prefix(prefix: str):
     try:
-        response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
+        files = [obj['Key'] for obj in iter_s3_objects(prefix) if not is_sidecar(obj['Key'])]
         
-        if 'Contents' not in response:
+        if not files:
             print(f"   No files found with prefix '{prefix}/'")
-            return []
-        
-        files = [obj['Key'] for obj in response['Contents']]
         return files
     except ClientError as e:
         print(f"   ❌ Error listing files: {e}")
         return []
 
+class S3KeyIndex:
+    """
+    In-memory index of S3 objects (key → size, ETag, last-modified).
+    Prefixes are listed once and then queried locally by the dedup and
+    verification steps; successful uploads are recorded as they happen.
+    Text sidecars are not documents and are left out.
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _folder(prefix: str) -> str:
+        return prefix if prefix.endswith("/") else f"{prefix}/"
+
+    def load(self, prefixes, max_workers: int = 8):
+        """List several prefixes concurrently and (re)populate the index with them."""
+        prefixes = [self._folder(prefix) for prefix in prefixes]
+
+        def list_prefix(prefix):
+            try:
+                return prefix, list(iter_s3_objects(prefix))
+            except ClientError as e:
+                print(f"   ❌ Error listing files under '{prefix}': {e}")
+                return prefix, []
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prefixes)))) as executor:
+            for prefix, objects in executor.map(list_prefix, prefixes):
+                with self._lock:
+                    for key in [key for key in self._objects if key.startswith(prefix)]:
+                        del self._objects[key]
+                    for obj in filter(lambda obj: not is_sidecar(obj["Key"]), objects):
+                        self._objects[obj["Key"]] = {
+                            "size": obj["Size"],
+                            "etag": obj["ETag"].strip('"'),
+                            "last_modified": obj["LastModified"],
+                        }
+        return self
+
+    def add(self, key: str, size: int = None, etag: str = None, last_modified=None):
+        """Record an object that was just uploaded."""
+        with self._lock:
+            self._objects[key] = {"size": size, "etag": etag, "last_modified": last_modified}
+
+    def get(self, key: str):
+        with self._lock:
+            return self._objects.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._objects
+
+    def keys(self, prefix: str):
+        """Sorted keys under a prefix."""
+        prefix = self._folder(prefix)
+        with self._lock:
+            return sorted(key for key in self._objects if key.startswith(prefix))
+
+    def names(self, prefix: str):
+        """File names (key without the prefix) under a prefix."""
+        prefix = self._folder(prefix)
+        return {key[len(prefix):] for key in self.keys(prefix)}
+
 # ---------------- Remove files from S3 ----------------
-def remove_files_from_S3(prefix:str=None,key:str=None):
+# delete_objects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+DELETE_WORKERS = int(os.getenv("DELETE_WORKERS", "4"))
+
+def delete_key_batch(keys) -> int:
+    """
+    Delete up to 1000 keys with one delete_objects call.
+    Prints every per-key error and returns the number of keys deleted.
+    """
+    try:
+        response = get_s3_client().delete_objects(
+            Bucket=BUCKET_NAME,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+    except ClientError as e:
+        print(f"   ❌ Failed to delete batch of {len(keys)} file(s) starting at {keys[0]}: {e}")
+        return 0
+    # Quiet mode only reports the keys that failed
+    errors = response.get('Errors', [])
+    for error in errors:
+        print(f"   ❌ {error['Key']}: {error.get('Code')} {error.get('Message')}")
+    failed = {error['Key'] for error in errors}
+    document_index.remove([key for key in keys if key not in failed])
+    return len(keys) - len(errors)
+
+def remove_files_from_S3(prefix:str=None,key:str=None,dry_run:bool=False,assume_yes:bool=False,
+                         max_workers:int=DELETE_WORKERS):
     """
     Remove files from S3 Bucket
     Args:
        prefix: If provided, remove all files with this prefix.
        key: If provided, remove the file corresponding to this key
+       dry_run: Only report what would be deleted
+       assume_yes: Skip the interactive confirmation (for unattended runs)
+       max_workers: Number of 1000-key delete batches in flight at once
+    Returns the number of files actually deleted.
     Note:Provide either prefix or key ,not both
     """
     if prefix is None and key is None:
@@ -229,29 +645,31 @@ def remove_files_from_S3(prefix:str=None,key:str=None):
     try:
         if prefix:
             print(f"\n🗑️  Removing all files with prefix: {prefix}")
-            response=s3.list_objects_v2(Bucket=BUCKET_NAME,Prefix=prefix)
-            if "Contents" not in response:
-                print(f"No files found with Prefix:{prefix}")
-                return None
-            files_to_delete=[{'key':obj['key']} for obj in response['Contents']]
-
-            print(f"Found {len(files_to_delete)} file(s) to delete:")
-            for file in files_to_delete:
-                print(f"{file['key']}")
-            confirm=input(f"Delete {len(files_to_delete)} files? yes/no:").strip().lower()
-            if confirm!='yes':
-                print("Deletion Cancelled?")
-                return None
+            keys_to_delete=[obj['Key'] for obj in iter_s3_objects(prefix)]
+            if not keys_to_delete:
+                print(f"   No files found with prefix: {prefix}")
+                return 0
+
+            print(f"   Found {len(keys_to_delete)} file(s) to delete:")
+            for file_key in keys_to_delete[:10]:
+                print(f"      • {file_key}")
+            if len(keys_to_delete) > 10:
+                print(f"      ... and {len(keys_to_delete) - 10} more")
+
+            if dry_run:
+                print(f"   🔎 Dry run: {len(keys_to_delete)} file(s) would be deleted")
+                return 0
+            if not assume_yes:
+                confirm=input(f"   ⚠️  Delete {len(keys_to_delete)} files? (yes/no): ").strip().lower()
+                if confirm!='yes':
+                    print("   ❌ Deletion cancelled")
+                    return 0
             
-            for i in range(0,len(files_to_delete)):
-                batch= files_to_delete[i]
-                s3.delete_objects(
-                    Bucket=BUCKET_NAME,
-                    Delete={'Objects':batch}
-                )
-                print(f"Deleted {files_to_delete[i]} file")
+            batches=[keys_to_delete[i:i + DELETE_BATCH_SIZE] for i in range(0,len(keys_to_delete),DELETE_BATCH_SIZE)]
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+                deleted_count=sum(executor.map(delete_key_batch, batches))
             
-            print(f" 🗑️ Total Deleted:{deleted_count} files")
+            print(f"   🗑️  Total deleted: {deleted_count}/{len(keys_to_delete)} file(s)")
         
         elif key:
             # Delete a specific file
@@ -259,17 +677,24 @@ def remove_files_from_S3(prefix:str=None,key:str=None):
             
             # Check if file exists
             try:
-                s3.head_object(Bucket=BUCKET_NAME, Key=key)
+                get_s3_client().head_object(Bucket=BUCKET_NAME, Key=key)
             except ClientError:
                 print(f"   ⚠️  File not found: {key}")
                 return 0
             
-            confirm = input(f"   ⚠️  Delete this file? (yes/no): ").strip().lower()
-            if confirm != 'yes':
-                print("   ❌ Deletion cancelled")
+            if dry_run:
+                print(f"   🔎 Dry run: {key} would be deleted")
                 return 0
+            if not assume_yes:
+                confirm = input(f"   ⚠️  Delete this file? (yes/no): ").strip().lower()
+                if confirm != 'yes':
+                    print("   ❌ Deletion cancelled")
+                    return 0
             
-            s3.delete_object(Bucket=BUCKET_NAME, Key=key)
+            get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=key)
+            # Deleting a missing key succeeds, so the text sidecar goes without a lookup
+            get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=sidecar_key(key))
+            document_index.remove([key])
             deleted_count = 1
             print(f"   ✅ File deleted: {key}")
         
@@ -277,33 +702,179 @@ def remove_files_from_S3(prefix:str=None,key:str=None):
         
     except ClientError as e:
         print(f"   ❌ Error removing files: {e}")
+        return deleted_count
+
+# ---------------- Watch mode ----------------
+def init_watch_worker():
+    """Detection worker initializer: Ctrl+C is handled by the watching process, which shuts the pool down."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    warm_up()
+
+def watched_folders() -> dict:
+    """Existing knowledge-base folders, as {path: folder name}."""
+    base = Path(__file__).parent
+    return {base / name: name for name in [*FOLDER_MAPPINGS, *TIER_FOLDERS] if (base / name).is_dir()}
+
+def watch_and_sync(index: "S3KeyIndex", manifest: UploadManifest, workers: int = UPLOAD_WORKERS,
+                   detect_workers: int = DETECT_WORKERS, poll_interval: float = WATCH_POLL_INTERVAL,
+                   sidecars: bool = False, watcher=None):
+    """
+    Keep the knowledge-base folders in sync until interrupted. Changes are
+    debounced into batches and only the files in a batch go through the
+    usual (sync-mode) upload and language-detection paths. Pass a watcher
+    opened before the initial sync so changes made during it are not missed.
+    """
+    folder_names = watched_folders()
+    if not folder_names:
+        print("⚠️  No folders to watch")
+        if watcher is not None:
+            watcher.close()
         return 0
+    if watcher is None:
+        watcher = open_watcher(list(folder_names), poll_interval)
+    print(f"\n👀 Watching {', '.join(f'{name}/' for name in folder_names.values())} (Ctrl+C to stop)")
+
+    total_uploaded = 0
+    with ThreadPoolExecutor(max_workers=workers) as upload_executor, \
+            ProcessPoolExecutor(max_workers=detect_workers, initializer=init_watch_worker) as detect_executor:
+        def on_batch(paths):
+            nonlocal total_uploaded
+            # Deleted files are ignored: removing objects stays an explicit --delete-prefix
+            changed = {}
+            for path in paths:
+                if path.is_file() and path.parent in folder_names:
+                    changed.setdefault(folder_names[path.parent], []).append(path)
+            try:
+                for folder_name, files in changed.items():
+                    if folder_name in FOLDER_MAPPINGS:
+                        total_uploaded += upload_folder_to_s3(folder_name, FOLDER_MAPPINGS[folder_name],
+                                                              upload_executor, index, manifest, files)
+                    else:
+                        total_uploaded += sum(upload_tier_folder_with_language_detection(
+                            folder_name, upload_executor, index, manifest, detect_executor, files, sidecars))
+            finally:
+                manifest.save()
+
+        try:
+            watch(watcher, on_batch)
+        except KeyboardInterrupt:
+            print("\n🛑 Watch stopped")
+        finally:
+            watcher.close()
+    return total_uploaded
+
+# ---------------- Run metrics ----------------
+def write_run_metrics(path: Path, started_at: float, totals: dict):
+    """Write the per-stage metrics collected during this run as a JSON summary."""
+    finished_at = time.time()
+    summary = {
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "duration_seconds": round(finished_at - started_at, 3),
+        "totals": totals,
+        "metrics": registry.snapshot(),
+    }
+    try:
+        path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        print(f"   📈 Metrics written to {path}")
+    except OSError as e:
+        print(f"   ⚠️  Could not write metrics to {path}: {e}")
 
 # ---------------- MAIN EXECUTION ----------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload knowledge-base folders to S3")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS,
+                        help=f"Number of concurrent uploads (default: {UPLOAD_WORKERS})")
+    parser.add_argument("--detect-workers", type=int, default=DETECT_WORKERS,
+                        help=f"Number of language-detection processes (default: {DETECT_WORKERS})")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only upload new or changed files, comparing content hashes with S3 ETags")
+    parser.add_argument("--delete-prefix", metavar="PREFIX",
+                        help="Delete every object under PREFIX instead of uploading")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="With --delete-prefix, only list what would be deleted")
+    parser.add_argument("--yes", action="store_true",
+                        help="With --delete-prefix, skip the confirmation prompt")
+    parser.add_argument("--expire-staged", action="store_true",
+                        help=f"Add the bucket lifecycle rule expiring abandoned API uploads under '{STAGING_PREFIX}/' "
+                             f"instead of uploading (run once per bucket)")
+    parser.add_argument("--watch", action="store_true",
+                        help="After the initial sync, keep watching the folders and upload changes as they happen "
+                             "(implies --sync)")
+    parser.add_argument("--poll-interval", type=float, default=WATCH_POLL_INTERVAL,
+                        help=f"With --watch, seconds between folder scans if inotify is unavailable "
+                             f"(default: {WATCH_POLL_INTERVAL})")
+    parser.add_argument("--sidecars", action="store_true",
+                        help="Also store the full extracted text of each uploaded tier document next to it "
+                             "(<key>.text.jsonl.gz)")
+    parser.add_argument("--metrics-out", type=Path, default=METRICS_PATH, metavar="PATH",
+                        help=f"Where to write the run's metrics summary as JSON (default: {METRICS_PATH})")
+    args = parser.parse_args()
+    args.sync = args.sync or args.watch
+    # Every upload worker may open up to max_concurrency connections for multipart parts
+    set_max_pool_connections(args.workers * TRANSFER_MAX_CONCURRENCY)
+
+    if args.delete_prefix:
+        remove_files_from_S3(prefix=args.delete_prefix, dry_run=args.dry_run, assume_yes=args.yes)
+        raise SystemExit(0)
+    if args.expire_staged:
+        raise SystemExit(0 if ensure_staging_lifecycle(STAGING_PREFIX) else 1)
+
     print("=" * 70)
     print(f"🚀 Multi-Folder S3 Upload Script with Langdetect Language Detection")
     print(f"   Bucket: {BUCKET_NAME} ({REGION})")
+    print(f"   Upload workers: {args.workers}, detection processes: {args.detect_workers}")
+    if args.sync:
+        print(f"   Mode: incremental sync (manifest: {MANIFEST_PATH})")
+    if args.sidecars:
+        print(f"   Text sidecars: on")
     print("=" * 70)
+    started_at = time.time()
     
     # Ensure bucket exists
     ensure_bucket_exists()
     
-    # Upload non-tiered folders
-    total_uploaded = 0
-    for local_folder, s3_prefix in FOLDER_MAPPINGS.items():
-        count = upload_folder_to_s3(local_folder, s3_prefix)
-        total_uploaded += count
+    # List every destination prefix once, concurrently; dedup and verification query this index
+    all_prefixes = list(FOLDER_MAPPINGS.values()) + [
+        f"{tier}-{lang}" for tier in TIER_FOLDERS for lang in ["spanish", "english"]
+    ]
+    index = S3KeyIndex().load(all_prefixes)
+    manifest = UploadManifest() if args.sync else None
+    # Opened before the initial sync, so files dropped while it runs reach the first watch batch
+    watcher = open_watcher(list(watched_folders()), args.poll_interval) if args.watch else None
     
-    # Upload tier folders with language detection
+    # Upload all folders at once, sharing one bounded pool of upload workers
+    total_uploaded = 0
     total_spanish = 0
     total_english = 0
     
-    for tier_folder in TIER_FOLDERS:
-        spanish, english = upload_tier_folder_with_language_detection(tier_folder)
-        total_spanish += spanish
-        total_english += english
-        total_uploaded += spanish + english
+    folder_count = len(FOLDER_MAPPINGS) + len(TIER_FOLDERS)
+    with ThreadPoolExecutor(max_workers=args.workers) as upload_executor, \
+            ProcessPoolExecutor(max_workers=args.detect_workers, initializer=warm_up) as detect_executor, \
+            ThreadPoolExecutor(max_workers=folder_count) as folder_executor:
+        # Upload non-tiered folders
+        folder_futures = [
+            folder_executor.submit(upload_folder_to_s3, local_folder, s3_prefix, upload_executor, index, manifest)
+            for local_folder, s3_prefix in FOLDER_MAPPINGS.items()
+        ]
+        # Upload tier folders with language detection
+        tier_futures = [
+            folder_executor.submit(upload_tier_folder_with_language_detection, tier_folder,
+                                   upload_executor, index, manifest, detect_executor, None, args.sidecars)
+            for tier_folder in TIER_FOLDERS
+        ]
+        
+        for future in folder_futures:
+            total_uploaded += future.result()
+        
+        for future in tier_futures:
+            spanish, english = future.result()
+            total_spanish += spanish
+            total_english += english
+            total_uploaded += spanish + english
+    
+    if manifest is not None:
+        manifest.save()
     
     # Summary
     print("\n" + "=" * 70)
@@ -312,13 +883,16 @@ if __name__ == "__main__":
     print(f"   Total files uploaded: {total_uploaded}")
     print(f"   Spanish files: {total_spanish}")
     print(f"   English files: {total_english}")
+    write_run_metrics(args.metrics_out, started_at, {
+        "uploaded": total_uploaded, "spanish": total_spanish, "english": total_english,
+    })
     
-    # Verify uploads by listing files in each prefix
+    # Verify uploads using the key index (initial listing plus recorded uploads)
     print(f"\n🔍 Verifying uploads in S3:")
     
     # List non-tiered folders
     for s3_prefix in FOLDER_MAPPINGS.values():
-        files = list_s3_files_by_prefix(s3_prefix)
+        files = index.keys(s3_prefix)
         print(f"\n   📂 {s3_prefix}/ ({len(files)} files)")
         for f in files[:5]:
             print(f"      • {f}")
@@ -329,7 +903,7 @@ if __name__ == "__main__":
     for tier in TIER_FOLDERS:
         for lang in ["spanish", "english"]:
             prefix = f"{tier}-{lang}"
-            files = list_s3_files_by_prefix(prefix)
+            files = index.keys(prefix)
             print(f"\n   📂 {prefix}/ ({len(files)} files)")
             for f in files[:5]:
                 print(f"      • {f}")
@@ -338,4 +912,11 @@ if __name__ == "__main__":
     
     print("\n" + "=" * 70)
     print("✅ Upload complete!")
-    print("=" * 70)
\ No newline at end of file
+    print("=" * 70)
+    
+    if args.watch:
+        total_uploaded += watch_and_sync(index, manifest, args.workers, args.detect_workers, args.poll_interval,
+                                        args.sidecars, watcher)
+        write_run_metrics(args.metrics_out, started_at, {
+            "uploaded": total_uploaded, "spanish": total_spanish, "english": total_english,
+        })
\ No newline at end of file
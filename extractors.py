@@ -0,0 +1,587 @@
+import io
+import os
+import re
+import time
+import zlib
+import struct
+import zipfile
+import threading
+import contextlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from pathlib import Path
+
+# ---------------- Sampling settings ----------------
+# Same character budget for every format, so detection cost does not grow with file size
+SAMPLE_MAX_CHARS = int(os.getenv("SAMPLE_MAX_CHARS", "1000"))
+# Never look past the first few pages (or slides), even if they hold almost no text
+SAMPLE_MAX_PAGES = 4
+
+MB = 1024 * 1024
+# Per-format budgets, overridable as EXTRACT_<FORMAT>_MAX_MB / EXTRACT_<FORMAT>_SECONDS
+EXTRACT_MAX_MB = int(os.getenv("EXTRACT_MAX_MB", "200"))
+EXTRACT_SECONDS = float(os.getenv("EXTRACT_SECONDS", "5"))
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DRAWING_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+APP_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/extended-properties}"
+
+# Leading bytes of each container we recognise
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"    # legacy .doc / .ppt / .xls
+
+class ExtractionError(Exception):
+    """A file whose text cannot (or will not) be extracted."""
+
+class UnsupportedFormatError(ExtractionError):
+    """The content is not a format any registered extractor handles."""
+
+class ExtractionBudgetError(ExtractionError):
+    """The file is larger than its format's size budget."""
+
+@contextlib.contextmanager
+def open_source(source):
+    """Yield a seekable binary file for a path or an already open file-like object."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+def source_size(f) -> int:
+    position = f.tell()
+    size = f.seek(0, os.SEEK_END)
+    f.seek(position)
+    return size
+
+# ---------------- Extractors ----------------
+class Extractor:
+    """Interface for text extractors: extract(source, max_chars) -> str."""
+    name = "base"
+
+    def __init__(self, max_bytes: int = None, time_budget: float = None):
+        key = self.name.upper()
+        self.max_bytes = max_bytes or int(os.getenv(f"EXTRACT_{key}_MAX_MB", str(EXTRACT_MAX_MB))) * MB
+        self.time_budget = time_budget or float(os.getenv(f"EXTRACT_{key}_SECONDS", str(EXTRACT_SECONDS)))
+
+    def check_size(self, f):
+        size = source_size(f)
+        if size > self.max_bytes:
+            raise ExtractionBudgetError(
+                f"{self.name} file of {size / MB:.1f} MB exceeds the {self.max_bytes / MB:.1f} MB budget")
+
+    def extract(self, source, max_chars: int = SAMPLE_MAX_CHARS) -> str:
+        """
+        Return up to max_chars of text from the start of the document. Once the
+        time budget is spent, whatever has been collected so far is returned.
+        """
+        with open_source(source) as f:
+            self.check_size(f)
+            return self.sample(f, max_chars, time.monotonic() + self.time_budget)
+
+    def sample(self, f, max_chars: int, deadline: float) -> str:
+        raise NotImplementedError
+
+    def page_count(self, source):
+        """Number of pages (or slides) in the document, or None if it cannot be told cheaply."""
+        try:
+            with open_source(source) as f:
+                return self.count_pages(f)
+        except Exception:
+            return None
+
+    def count_pages(self, f):
+        return None
+
+    def iter_pages(self, source):
+        """
+        Yield the full text of the document one page (or slide) at a time, for
+        consumers that need all of it; only the size budget applies.
+        """
+        with open_source(source) as f:
+            self.check_size(f)
+            yield from self.read_pages(f)
+
+    def read_pages(self, f):
+        raise NotImplementedError
+
+class PdfExtractor(Extractor):
+    """Extract text page by page (at most SAMPLE_MAX_PAGES pages)."""
+    name = "pdf"
+
+    def sample(self, f, max_chars: int, deadline: float) -> str:
+        import PyPDF2
+        text = ""
+        # The budget is checked between pages; a single page is never interrupted
+        for page in PyPDF2.PdfReader(f).pages[:SAMPLE_MAX_PAGES]:
+            text += page.extract_text() or ""
+            if len(text) >= max_chars or time.monotonic() > deadline:
+                break
+        text = text[:max_chars]
+        if len(text.strip()) < OCR_MIN_CHARS:
+            # Little or no embedded text: most likely a scanned document
+            text = ocr_sample(f, max_chars) or text
+        return text
+
+    def count_pages(self, f):
+        import PyPDF2
+        # Read from the page tree; no page content is parsed
+        return len(PyPDF2.PdfReader(f).pages)
+
+    def read_pages(self, f):
+        import PyPDF2
+        # Scanned pages come out empty: OCR stays limited to the sample
+        for page in PyPDF2.PdfReader(f).pages:
+            yield page.extract_text() or ""
+
+# ---------------- OCR fallback for scanned PDFs ----------------
+# PDFs with less embedded text than this are OCR'd (0 disables OCR)
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "50"))
+# Only the first pages are rasterised, in grayscale at a low resolution
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "2"))
+OCR_DPI = int(os.getenv("OCR_DPI", "100"))
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "eng+spa")
+# Wall-time budget per file; past it the file is classified from whatever text it had
+OCR_SECONDS = float(os.getenv("OCR_SECONDS", "20"))
+# Concurrent OCR jobs per process (each detection worker process has its own pool)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+
+class OcrUnavailableError(Exception):
+    """pytesseract/pdf2image or the tesseract/poppler binaries are missing."""
+
+_ocr_pool = None
+_ocr_pool_pid = None
+_ocr_pool_lock = threading.Lock()
+_ocr_unavailable = None
+
+def get_ocr_pool() -> ThreadPoolExecutor:
+    global _ocr_pool, _ocr_pool_pid
+    with _ocr_pool_lock:
+        # Threads do not survive a fork, so each process builds its own pool
+        if _ocr_pool is None or _ocr_pool_pid != os.getpid():
+            _ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+            _ocr_pool_pid = os.getpid()
+        return _ocr_pool
+
+def ocr_pdf(source, max_chars: int, budget: float) -> str:
+    """OCR the first OCR_MAX_PAGES pages of a PDF (a path or its bytes) within budget seconds."""
+    try:
+        import pytesseract
+        from pdf2image import convert_from_bytes, convert_from_path
+        from pdf2image.exceptions import PDFInfoNotInstalledError
+    except ImportError as e:
+        raise OcrUnavailableError(f"{e.name} is not installed")
+    # tesseract would otherwise start a thread per core in every detection process
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    deadline = time.monotonic() + budget
+    options = dict(dpi=OCR_DPI, first_page=1, last_page=OCR_MAX_PAGES, grayscale=True, timeout=budget)
+    try:
+        if isinstance(source, bytes):
+            images = convert_from_bytes(source, **options)
+        else:
+            images = convert_from_path(source, **options)
+        text = ""
+        for image in images:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            text += pytesseract.image_to_string(image, lang=OCR_LANGUAGES, timeout=remaining)
+            if len(text) >= max_chars:
+                break
+    except (PDFInfoNotInstalledError, pytesseract.TesseractNotFoundError) as e:
+        raise OcrUnavailableError(str(e))
+    return text[:max_chars]
+
+def ocr_sample(f, max_chars: int) -> str:
+    """
+    Text of a scanned PDF via OCR, run on the bounded OCR pool. Returns '' if
+    OCR is unavailable, fails or runs out of its budget.
+    """
+    global _ocr_unavailable
+    if _ocr_unavailable:
+        return ""
+    name = getattr(f, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        source = name
+    else:
+        f.seek(0)
+        source = f.read()
+
+    future = get_ocr_pool().submit(ocr_pdf, source, max_chars, OCR_SECONDS)
+    try:
+        # pdftoppm and tesseract are killed at the budget; the margin covers their startup
+        return future.result(timeout=OCR_SECONDS + 5)
+    except OcrUnavailableError as e:
+        _ocr_unavailable = str(e)
+        print(f"   ⚠️  OCR unavailable ({e}); scanned PDFs are classified without it")
+    except FutureTimeoutError:
+        print(f"   ⚠️  OCR exceeded its {OCR_SECONDS:.0f}s budget")
+    except Exception as e:
+        print(f"   ⚠️  OCR failed: {e}")
+    return ""
+
+def sample_xml_text(xml_file, text_tag: str, break_tag: str, max_chars: int, deadline: float, parts: list) -> int:
+    """
+    Stream text elements out of one OOXML part into parts, stopping at max_chars
+    or the deadline. Returns the number of characters collected.
+    """
+    return collect_xml_text(ET.iterparse(xml_file, events=("end",)), text_tag, break_tag, max_chars, deadline, parts)
+
+def collect_xml_text(events, text_tag: str, break_tag: str, max_chars: int, deadline: float, parts: list) -> int:
+    collected = 0
+    for _, elem in events:
+        if elem.tag == text_tag and elem.text:
+            parts.append(elem.text)
+            collected += len(elem.text)
+        elif elem.tag == break_tag:
+            parts.append("\n")
+            elem.clear()
+        if collected >= max_chars or time.monotonic() > deadline:
+            break
+    return collected
+
+class DocxExtractor(Extractor):
+    """
+    Stream text runs out of word/document.xml. Only that one zip member is
+    decompressed; embedded images are never read.
+    """
+    name = "docx"
+
+    def sample(self, f, max_chars: int, deadline: float) -> str:
+        parts = []
+        with zipfile.ZipFile(f) as archive, archive.open("word/document.xml") as xml_file:
+            sample_xml_text(xml_file, f"{WORD_NS}t", f"{WORD_NS}p", max_chars, deadline, parts)
+        return "".join(parts)[:max_chars]
+
+    def read_pages(self, f):
+        # Word stores no pages: the text is split at explicit page breaks and where Word last rendered one
+        parts = []
+        with zipfile.ZipFile(f) as archive, archive.open("word/document.xml") as xml_file:
+            for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == f"{WORD_NS}lastRenderedPageBreak" or (
+                            elem.tag == f"{WORD_NS}br" and elem.get(f"{WORD_NS}type") == "page"):
+                        yield "".join(parts)
+                        parts = []
+                elif elem.tag == f"{WORD_NS}t" and elem.text:
+                    parts.append(elem.text)
+                elif elem.tag == f"{WORD_NS}p":
+                    parts.append("\n")
+                    elem.clear()
+        yield "".join(parts)
+
+    def count_pages(self, f):
+        # Pagination is done by the word processor: only the count it saved in docProps/app.xml is known
+        with zipfile.ZipFile(f) as archive, archive.open("docProps/app.xml") as xml_file:
+            for _, elem in ET.iterparse(xml_file):
+                if elem.tag == f"{APP_NS}Pages" and elem.text:
+                    return int(elem.text)
+        return None
+
+def is_slide(member: str) -> bool:
+    return member.startswith("ppt/slides/slide") and member.endswith(".xml")
+
+def slide_number(member: str) -> int:
+    # "ppt/slides/slide12.xml" -> 12
+    return int(Path(member).stem[len("slide"):] or 0)
+
+class PptxExtractor(Extractor):
+    """
+    Stream text from the first slides in order (ppt/slides/slideN.xml), stopping
+    once max_chars are collected. Media and slide layouts are never read.
+    """
+    name = "pptx"
+
+    def sample(self, f, max_chars: int, deadline: float) -> str:
+        parts = []
+        collected = 0
+        with zipfile.ZipFile(f) as archive:
+            slides = sorted(filter(is_slide, archive.namelist()), key=slide_number)
+            for slide in slides[:SAMPLE_MAX_PAGES]:
+                with archive.open(slide) as xml_file:
+                    collected += sample_xml_text(xml_file, f"{DRAWING_NS}t", f"{DRAWING_NS}p",
+                                                 max_chars - collected, deadline, parts)
+                if collected >= max_chars or time.monotonic() > deadline:
+                    break
+        return "".join(parts)[:max_chars]
+
+    def count_pages(self, f):
+        with zipfile.ZipFile(f) as archive:
+            return sum(map(is_slide, archive.namelist()))
+
+    def read_pages(self, f):
+        with zipfile.ZipFile(f) as archive:
+            for slide in sorted(filter(is_slide, archive.namelist()), key=slide_number):
+                parts = []
+                with archive.open(slide) as xml_file:
+                    sample_xml_text(xml_file, f"{DRAWING_NS}t", f"{DRAWING_NS}p", float("inf"), float("inf"), parts)
+                yield "".join(parts)
+
+# ---------------- Format sniffing ----------------
+# Marker member of each OOXML format inside the zip container
+OOXML_MARKERS = {
+    "word/document.xml": "docx",
+    "ppt/presentation.xml": "pptx",
+}
+
+def sniff_format(source) -> str:
+    """
+    Identify a document by its content rather than its suffix: '%PDF-' is a
+    PDF, a zip is told apart by its members (reading only the central
+    directory). Anything else raises UnsupportedFormatError.
+    """
+    with open_source(source) as f:
+        head = f.read(8)
+        if head.startswith(PDF_MAGIC):
+            return "pdf"
+        if head.startswith(OLE_MAGIC):
+            raise UnsupportedFormatError("legacy Office files (.doc/.ppt) are not supported; save as .docx/.pptx")
+        if head.startswith(ZIP_MAGIC):
+            try:
+                with zipfile.ZipFile(f) as archive:
+                    names = set(archive.namelist())
+            except zipfile.BadZipFile as e:
+                raise UnsupportedFormatError(f"corrupt zip container: {e}")
+            for member, format in OOXML_MARKERS.items():
+                if member in names:
+                    return format
+            raise UnsupportedFormatError("zip archive is not a .docx or .pptx document")
+    raise UnsupportedFormatError("unrecognised file format")
+
+# ---------------- Registry ----------------
+EXTRACTORS = {
+    "pdf": PdfExtractor,
+    "docx": DocxExtractor,
+    "pptx": PptxExtractor,
+}
+_extractors = {}
+
+def register_extractor(format: str, factory):
+    """Make an extractor available for a sniffed format."""
+    EXTRACTORS[format] = factory
+    _extractors.pop(format, None)
+
+def get_extractor(source) -> Extractor:
+    """Shared extractor instance for a document, chosen by sniffing its content."""
+    format = sniff_format(source)
+    if format not in EXTRACTORS:
+        raise UnsupportedFormatError(f"no extractor registered for '{format}'")
+    if format not in _extractors:
+        _extractors[format] = EXTRACTORS[format]()
+    return _extractors[format]
+
+def extract_sample(source, max_chars: int = SAMPLE_MAX_CHARS) -> str:
+    """Sniff a document's format and return a bounded text sample from it."""
+    return get_extractor(source).extract(source, max_chars)
+
+# ---------------- Streaming head sampling ----------------
+# How much of a streamed document is kept for sampling, and how often the head is re-parsed
+STREAM_SAMPLE_MAX_BYTES = int(os.getenv("STREAM_SAMPLE_MAX_MB", "8")) * MB
+STREAM_SAMPLE_STEP = 256 * 1024
+# Decompressed bytes read from any one stream or zip member of the head
+HEAD_MEMBER_MAX_BYTES = 4 * MB
+
+PDF_STREAM_RE = re.compile(rb"stream\r?\n")
+PDF_TEXT_BLOCK_RE = re.compile(rb"\bBT\b(.*?)\bET\b", re.S)
+# Literal strings, TJ array brackets and kerning numbers inside a text block
+PDF_TEXT_TOKEN_RE = re.compile(rb"\((?:\\.|[^\\()])*\)|\[|\]|-?\d*\.?\d+", re.S)
+PDF_ESCAPE_RE = re.compile(rb"\\([0-7]{1,3}|.)", re.S)
+PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"\n": b""}
+# A TJ adjustment this negative (thousandths of an em) is a word gap
+PDF_TJ_SPACE = -250
+
+# struct zip local file header: signature, version, flags, method, time, date,
+# crc, compressed size, uncompressed size, name length, extra length
+ZIP_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+ZIP_DATA_DESCRIPTOR = b"PK\x07\x08"
+
+def decode_pdf_string(raw: bytes) -> str:
+    def unescape(match):
+        code = match.group(1)
+        if code[:1].isdigit():
+            return bytes([int(code, 8) & 0xFF])
+        return PDF_ESCAPES.get(code, code)
+    # Standard fonts use WinAnsiEncoding; strings in embedded CID fonts come out as noise
+    return PDF_ESCAPE_RE.sub(unescape, raw).decode("cp1252", errors="replace")
+
+def pdf_head_text(head: bytes, max_chars: int) -> str:
+    """
+    Text shown by the content streams found in the first bytes of a PDF.
+    Only uncompressed and Flate streams are read; image streams are skipped.
+    """
+    parts = []
+    collected = 0
+    for match in PDF_STREAM_RE.finditer(head):
+        header = head[head.rfind(b"obj", 0, match.start()):match.start()]
+        if b"/Image" in header or (b"/Filter" in header and b"/FlateDecode" not in header):
+            continue
+        end = head.find(b"endstream", match.end())
+        data = head[match.end():end if end != -1 else len(head)]
+        if b"/FlateDecode" in header:
+            try:
+                data = zlib.decompressobj().decompress(data, HEAD_MEMBER_MAX_BYTES)
+            except zlib.error:
+                continue
+        for block in PDF_TEXT_BLOCK_RE.finditer(data):
+            in_array = False
+            for token in PDF_TEXT_TOKEN_RE.findall(block.group(1)):
+                if token.startswith(b"("):
+                    text = decode_pdf_string(token[1:-1])
+                    parts.append(text if in_array else text + " ")
+                    collected += len(text)
+                elif token == b"[":
+                    in_array = True
+                elif token == b"]":
+                    in_array = False
+                    parts.append(" ")
+                elif in_array and float(token) <= PDF_TJ_SPACE:
+                    parts.append(" ")
+            parts.append("\n")
+            if collected >= max_chars:
+                return "".join(parts)[:max_chars]
+    return "".join(parts)[:max_chars]
+
+def ooxml_head_text(head: bytes, max_chars: int) -> str:
+    """
+    Text from the document (or first slides) of a .docx/.pptx, walking the zip
+    local file headers in the first bytes rather than the central directory at its end.
+    """
+    parts = []
+    collected = 0
+    slides = 0
+    offset = 0
+    while offset + ZIP_LOCAL_HEADER.size <= len(head):
+        signature, _, flags, method, _, _, _, size, _, name_len, extra_len = ZIP_LOCAL_HEADER.unpack_from(head, offset)
+        if signature != ZIP_MAGIC:
+            break
+        name = head[offset + ZIP_LOCAL_HEADER.size:offset + ZIP_LOCAL_HEADER.size + name_len].decode("utf-8", "replace")
+        start = offset + ZIP_LOCAL_HEADER.size + name_len + extra_len
+        if name.startswith("xl/"):
+            raise UnsupportedFormatError("zip archive is not a .docx or .pptx document")
+        # With flag bit 3 the sizes follow the data instead of preceding it
+        sized = not flags & 0x08
+
+        slide = is_slide(name)
+        if name == "word/document.xml" or slide:
+            data = head[start:start + size] if sized else head[start:]
+            if method == zipfile.ZIP_DEFLATED:
+                data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(data, HEAD_MEMBER_MAX_BYTES)
+            namespace = DRAWING_NS if slide else WORD_NS
+            # A pull parser keeps the elements before the point where the head cuts the member off
+            parser = ET.XMLPullParser(events=("end",))
+            try:
+                parser.feed(data)
+            except ET.ParseError:
+                pass
+            collected += collect_xml_text(parser.read_events(), f"{namespace}t", f"{namespace}p",
+                                          max_chars - collected, float("inf"), parts)
+            slides += slide
+            if collected >= max_chars or not slide or slides >= SAMPLE_MAX_PAGES:
+                break
+
+        if sized:
+            offset = start + size
+        elif method == zipfile.ZIP_DEFLATED:
+            # Inflate (and discard) the member just to find where it ends
+            inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            pending = head[start:]
+            while pending and not inflater.eof:
+                inflater.decompress(pending, 1 * MB)
+                pending = inflater.unconsumed_tail
+            if not inflater.eof:
+                break
+            offset = len(head) - len(inflater.unused_data)
+            offset += 16 if head[offset:offset + 4] == ZIP_DATA_DESCRIPTOR else 12
+        else:
+            break
+    return "".join(parts)[:max_chars]
+
+HEAD_SAMPLERS = {
+    "pdf": pdf_head_text,
+    "ooxml": ooxml_head_text,
+}
+
+def sniff_head(head: bytes) -> str:
+    """Container format from the first bytes alone ('pdf' or 'ooxml')."""
+    if head.startswith(PDF_MAGIC):
+        return "pdf"
+    if head.startswith(OLE_MAGIC):
+        raise UnsupportedFormatError("legacy Office files (.doc/.ppt) are not supported; save as .docx/.pptx")
+    if head.startswith(ZIP_MAGIC):
+        return "ooxml"
+    raise UnsupportedFormatError("unrecognised file format")
+
+def sample_head(format: str, head: bytes, max_chars: int, complete: bool = False) -> str:
+    """
+    Text sample of a streamed document's head. A complete document that fit in
+    the head is sampled with its regular extractor instead. A plain function of
+    its arguments, so it can run in a worker process.
+    """
+    if complete:
+        return extract_sample(io.BytesIO(head), max_chars)
+    return HEAD_SAMPLERS[format](head, max_chars)
+
+class StreamSampler:
+    """
+    Bounded text sample of a document whose bytes arrive as a stream (e.g. an
+    upload being proxied to S3). Only the first STREAM_SAMPLE_MAX_BYTES are
+    kept. feed() only buffers; when it reports that the head is worth parsing
+    again, run sample_head(*parse_args()) anywhere and hand the text to update().
+    """
+
+    def __init__(self, max_chars: int = SAMPLE_MAX_CHARS, max_bytes: int = STREAM_SAMPLE_MAX_BYTES):
+        self.max_chars = max_chars
+        self.max_bytes = max_bytes
+        self.head = bytearray()
+        self.total = 0
+        self.format = None
+        self.text = ""
+        self.done = False
+        self._parsed_at = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Add the next chunk; raises UnsupportedFormatError as soon as the format
+        is known to be wrong. Returns True when the head should be parsed again.
+        """
+        self.total += len(chunk)
+        if self.done:
+            return False
+        self.head += chunk[:self.max_bytes - len(self.head)]
+        if self.format is None and len(self.head) >= len(OLE_MAGIC):
+            self.format = sniff_head(bytes(self.head[:len(OLE_MAGIC)]))
+        # Re-parse each time the head has grown by half, so parsing stays linear in its size
+        grown = len(self.head) - self._parsed_at
+        return self.format is not None and (grown >= max(STREAM_SAMPLE_STEP, self._parsed_at // 2)
+                                            or len(self.head) >= self.max_bytes)
+
+    def parse_args(self, complete: bool = False) -> tuple:
+        """Arguments of sample_head for the head so far; complete once the whole stream has been fed."""
+        complete = complete and self.total <= self.max_bytes
+        if self.format is None and not complete:
+            self.format = sniff_head(bytes(self.head))
+        self._parsed_at = len(self.head)
+        return self.format, bytes(self.head), self.max_chars, complete
+
+    def is_final(self, complete: bool = False) -> bool:
+        """Whether text already is the sample, so the head need not be parsed again."""
+        return self.done and not (complete and self.total <= self.max_bytes)
+
+    def update(self, text: str):
+        """Record the text sample_head returned for parse_args()."""
+        self.text = text
+        self.done = len(self.text) >= self.max_chars or len(self.head) >= self.max_bytes
+
+    def finish(self, complete: bool = True) -> str:
+        """
+        Parse the head in this thread and return the sample. Once the stream is
+        complete, a document that fit in the head is sampled with its regular
+        extractor instead.
+        """
+        if self.is_final(complete):
+            return self.text
+        self.update(sample_head(*self.parse_args(complete)))
+        return self.text
@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+# ---------------- Watch settings ----------------
+# A batch is handed over once no change has been seen for this long...
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "1.0"))
+# ...or once its oldest change is this old, so a steady stream of edits cannot starve it
+WATCH_MAX_DELAY_SECONDS = float(os.getenv("WATCH_MAX_DELAY_SECONDS", "10"))
+# Interval between directory scans when inotify is unavailable
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "2.0"))
+
+# Editor swap files, partial downloads and Office lock files are never uploaded
+IGNORED_PREFIXES = (".", "~$")
+IGNORED_SUFFIXES = (".tmp", ".swp", ".part", ".crdownload")
+
+def is_watched_name(name: str) -> bool:
+    # Same "*.*" pattern the folder uploads glob for
+    return "." in name and not name.startswith(IGNORED_PREFIXES) and not name.endswith(IGNORED_SUFFIXES)
+
+def list_folder(folder: Path):
+    return [path for path in folder.glob("*.*") if is_watched_name(path.name) and path.is_file()]
+
+# ---------------- inotify (Linux) ----------------
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """
+    Folder watcher on the inotify syscalls (called through ctypes, no extra
+    dependency). A file is reported once it is closed after writing or moved
+    in, so half-written files are not picked up.
+    """
+
+    def __init__(self, folders):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self._folders = {}
+        try:
+            for folder in folders:
+                wd = libc.inotify_add_watch(self._fd, os.fsencode(str(folder)), IN_CLOSE_WRITE | IN_MOVED_TO)
+                if wd < 0:
+                    err = ctypes.get_errno()
+                    raise OSError(err, f"inotify_add_watch failed for '{folder}': {os.strerror(err)}")
+                self._folders[wd] = Path(folder)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def poll(self, timeout: float) -> set:
+        """Wait up to timeout seconds and return the paths that changed."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: fall back to everything in the watched folders
+                for folder in self._folders.values():
+                    changed.update(list_folder(folder))
+            elif mask & (IN_IGNORED | IN_DELETE_SELF):
+                folder = self._folders.pop(wd, None)
+                if folder is not None:
+                    print(f"⚠️  Stopped watching {folder} (folder removed)")
+            elif wd in self._folders and name and not mask & IN_ISDIR:
+                name = os.fsdecode(name)
+                if is_watched_name(name):
+                    changed.add(self._folders[wd] / name)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+# ---------------- Polling fallback ----------------
+class PollingWatcher:
+    """Folder watcher that compares (size, mtime) snapshots every poll interval."""
+
+    def __init__(self, folders, interval: float = WATCH_POLL_INTERVAL):
+        self.folders = [Path(folder) for folder in folders]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        for folder in self.folders:
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                if not is_watched_name(entry.name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.is_file():
+                    snapshot[folder / entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout: float) -> set:
+        time.sleep(max(0.0, min(timeout, self.interval)))
+        snapshot = self._scan()
+        changed = {path for path, state in snapshot.items() if self._snapshot.get(path) != state}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+def open_watcher(folders, poll_interval: float = WATCH_POLL_INTERVAL):
+    """inotify on Linux, otherwise (or if it cannot be set up) a polling watcher."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folders)
+        except (OSError, AttributeError) as e:
+            # AttributeError: libc without inotify symbols; ENOSPC: out of inotify watches
+            reason = "watch limit reached" if getattr(e, "errno", None) == errno.ENOSPC else e
+            print(f"⚠️  inotify unavailable ({reason}) - polling every {poll_interval}s")
+    return PollingWatcher(folders, poll_interval)
+
+# ---------------- Debounced watch loop ----------------
+def watch(watcher, on_batch, debounce: float = WATCH_DEBOUNCE_SECONDS,
+          max_delay: float = WATCH_MAX_DELAY_SECONDS, stop_event=None):
+    """
+    Collect changes from the watcher and call on_batch(paths) with each
+    coalesced batch: a burst of events for the same files becomes one call.
+    A batch that fails is reported and dropped; watching goes on. Runs until
+    stop_event is set (or KeyboardInterrupt).
+    """
+    pending = set()
+    first_seen = last_seen = 0.0
+    while stop_event is None or not stop_event.is_set():
+        if pending:
+            timeout = max(0.0, min(last_seen + debounce, first_seen + max_delay) - time.monotonic())
+        else:
+            timeout = 1.0
+        changed = watcher.poll(timeout)
+        now = time.monotonic()
+        if changed:
+            if not pending:
+                first_seen = now
+            pending |= changed
+            last_seen = now
+        if pending and (now - last_seen >= debounce or now - first_seen >= max_delay):
+            batch, pending = sorted(pending), set()
+            try:
+                on_batch(batch)
+            except Exception as e:
+                # Its files are picked up again when they next change
+                print(f"⚠️  Sync of {len(batch)} changed file(s) failed: {e} - still watching")
@@ -0,0 +1,137 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+# ---------------- Cache settings ----------------
+# On-disk tier shared by the CLI (document_upload.py) and the API (upload_app.py)
+CACHE_PATH = Path(os.getenv("LANG_CACHE_PATH", Path(__file__).parent / ".language_cache.sqlite3"))
+# Entries kept in the per-process LRU
+CACHE_MEMORY_ENTRIES = int(os.getenv("LANG_CACHE_MEMORY_ENTRIES", "4096"))
+# Entries kept on disk; the least recently used are evicted past this bound
+CACHE_DISK_ENTRIES = int(os.getenv("LANG_CACHE_DISK_ENTRIES", "100000"))
+
+class CachedDetection(NamedTuple):
+    code: str
+    confidence: float
+    pages: Optional[int] = None
+
+def hash_file(filepath, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's content, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# ---------------- Two-tier cache ----------------
+class LanguageCache:
+    """
+    Detection results keyed by content hash (prefixed with the detector's name
+    by detect_language_details): an in-process LRU in front of a size-bounded
+    SQLite table. Safe to use from several threads and processes.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_memory_entries: int = CACHE_MEMORY_ENTRIES,
+                 max_disk_entries: int = CACHE_DISK_ENTRIES):
+        self.path = Path(path)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork, so each process opens its own
+        if self._conn is None or self._conn_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS detections ("
+                " sha256 TEXT PRIMARY KEY, code TEXT NOT NULL,"
+                " confidence REAL NOT NULL, last_used REAL NOT NULL, pages INTEGER)"
+            )
+            if "pages" not in {row[1] for row in conn.execute("PRAGMA table_info(detections)")}:
+                # Cache files from before page counts gain the column in place
+                try:
+                    conn.execute("ALTER TABLE detections ADD COLUMN pages INTEGER")
+                except sqlite3.OperationalError:
+                    pass    # another process added it first
+            conn.execute("CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used)")
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, digest: str, detection: CachedDetection):
+        self._memory[digest] = detection
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, digest: str) -> Optional[CachedDetection]:
+        with self._lock:
+            detection = self._memory.get(digest)
+            if detection is not None:
+                self._memory.move_to_end(digest)
+                return detection
+
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT code, confidence, pages FROM detections WHERE sha256 = ?", (digest,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE detections SET last_used = ? WHERE sha256 = ?", (time.time(), digest))
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"   ⚠️  Language cache unavailable: {e}")
+                row = None
+
+            if row is None:
+                return None
+            detection = CachedDetection(*row)
+            self._remember(digest, detection)
+            return detection
+
+    def put(self, digest: str, detection: CachedDetection):
+        with self._lock:
+            self._remember(digest, detection)
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO detections (sha256, code, confidence, last_used, pages) VALUES (?, ?, ?, ?, ?)",
+                    (digest, detection.code, detection.confidence, time.time(), detection.pages),
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM detections").fetchone()
+                if count > self.max_disk_entries:
+                    # Evict in batches of ~10% so eviction is not paid on every insert
+                    excess = count - self.max_disk_entries + self.max_disk_entries // 10
+                    conn.execute(
+                        "DELETE FROM detections WHERE sha256 IN ("
+                        " SELECT sha256 FROM detections ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"   ⚠️  Language cache unavailable: {e}")
+
+    def clear(self):
+        """Forget every cached detection, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._connection()
+                conn.execute("DELETE FROM detections")
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"   ⚠️  Language cache unavailable: {e}")
+
+# Shared instance used by detect_language_from_file
+language_cache = LanguageCache()
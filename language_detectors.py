@@ -0,0 +1,155 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+from typing import NamedTuple
+
+# ---------------- Detector settings ----------------
+# Which detector detect_language_from_file uses (see DETECTORS below)
+LANGUAGE_DETECTOR = os.getenv("LANGUAGE_DETECTOR", "fast")
+# Below this confidence the fast classifier defers to langdetect
+FAST_MIN_CONFIDENCE = float(os.getenv("FAST_MIN_CONFIDENCE", "0.8"))
+
+class Detection(NamedTuple):
+    code: str           # ISO 639-1 code, '' if nothing could be detected
+    confidence: float   # 0.0 - 1.0
+
+class LanguageDetector:
+    """Interface for language detectors: detect(text) -> Detection."""
+    name = "base"
+
+    def detect(self, text: str) -> Detection:
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Load anything expensive ahead of the first call."""
+
+# ---------------- langdetect ----------------
+class LangdetectDetector(LanguageDetector):
+    """General-purpose probabilistic detector (~55 languages)."""
+    name = "langdetect"
+
+    # langdetect reseeds the global `random` module on every call, so
+    # concurrent detections must not interleave
+    _lock = threading.Lock()
+
+    def detect(self, text: str) -> Detection:
+        from langdetect import detect_langs, LangDetectException, DetectorFactory
+        DetectorFactory.seed = 0
+        try:
+            with self._lock:
+                best = detect_langs(text)[0]
+        except LangDetectException:
+            return Detection("", 0.0)
+        return Detection(best.lang, best.prob)
+
+    def warm_up(self):
+        from langdetect import DetectorFactory
+        from langdetect.detector_factory import init_factory
+        init_factory()
+        DetectorFactory.seed = 0
+
+# ---------------- English / Spanish classifier ----------------
+# Function words that are frequent in one language and rare in the other.
+# Words shared by both ("a", "no", "me", "he", ...) are left out on purpose.
+ENGLISH_WORDS = {
+    word: 1.0 for word in (
+        "the and of to is in that it for with as was on are be this by have from or an which you "
+        "not but at they his her we their will would can there been has were more about what when "
+        "how all if our your these also than into only other should must each its who them do does "
+        "i my he she him any some such"
+    ).split()
+}
+SPANISH_WORDS = {
+    word: 1.0 for word in (
+        "de la que el en los del las por un una para es con se su al lo como más pero sus le ya este "
+        "esta sí porque muy sin sobre también entre cuando todo ser son dos hay fue ha desde está nos "
+        "durante estos tiene puede todos uno les ni otros ese eso ante ellos esto antes algunos qué "
+        "unos yo otro otras otra él tanto esa mucho quienes nada muchos cual poco ella estar estas "
+        "algunas algo nosotros mi mis tú te ti tu tus usted ustedes y e cómo dónde según cada"
+    ).split()
+}
+# Character patterns: accents and inverted punctuation are Spanish-only,
+# "th"/"w"/"k" and "-ing" endings are rare in Spanish
+SPANISH_CHARS = re.compile(r"[áéíóúñ¿¡]")
+SPANISH_SUFFIXES = re.compile(r"(?:ción|ciones|mente|dad|idades)\b")
+ENGLISH_PATTERNS = re.compile(r"th|w|k|ing\b")
+TOKEN_RE = re.compile(r"[a-záéíóúüñ]+")
+
+class EnglishSpanishDetector(LanguageDetector):
+    """
+    Deterministic stopword / character-pattern scorer restricted to 'en' and 'es'.
+    Each matched feature adds evidence for one language; the confidence is a
+    logistic function of the margin between the two, so a close call (or
+    text with almost no evidence) falls below the fallback threshold.
+    The confidence is scaled down when fewer tokens than usual are function
+    words of the winner: other Romance languages share accents and a few
+    words with Spanish, and must reach the fallback instead of scoring as 'es'.
+    """
+    name = "enes"
+
+    CHAR_WEIGHT = 0.5
+    # Share of tokens that are listed function words in ordinary prose of each
+    # language (~0.25 English, ~0.4 Spanish; French and Portuguese match at most
+    # ~0.25 of the Spanish list). Lower coverage lowers the confidence in proportion
+    FULL_COVERAGE = {"en": 0.2, "es": 0.35}
+
+    def detect(self, text: str) -> Detection:
+        text = text.lower()
+        counts = Counter(TOKEN_RE.findall(text))
+        english = sum(ENGLISH_WORDS.get(word, 0.0) * n for word, n in counts.items())
+        spanish = sum(SPANISH_WORDS.get(word, 0.0) * n for word, n in counts.items())
+        spanish += self.CHAR_WEIGHT * (len(SPANISH_CHARS.findall(text)) + len(SPANISH_SUFFIXES.findall(text)))
+        english += self.CHAR_WEIGHT * len(ENGLISH_PATTERNS.findall(text))
+
+        if english == spanish == 0:
+            return Detection("", 0.0)
+        code = "es" if spanish > english else "en"
+        words = SPANISH_WORDS if code == "es" else ENGLISH_WORDS
+        coverage = sum(n for word, n in counts.items() if word in words) / max(sum(counts.values()), 1)
+        confidence = 1.0 / (1.0 + math.exp(-abs(spanish - english)))
+        return Detection(code, confidence * min(1.0, coverage / self.FULL_COVERAGE[code]))
+
+class FallbackDetector(LanguageDetector):
+    """Use the primary detector, deferring to the fallback when its confidence is low."""
+
+    def __init__(self, primary: LanguageDetector, fallback: LanguageDetector, min_confidence: float):
+        self.primary = primary
+        self.fallback = fallback
+        self.min_confidence = min_confidence
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def detect(self, text: str) -> Detection:
+        result = self.primary.detect(text)
+        if result.confidence >= self.min_confidence:
+            return result
+        fallback = self.fallback.detect(text)
+        return fallback if fallback.code else result
+
+    def warm_up(self):
+        self.primary.warm_up()
+        self.fallback.warm_up()
+
+# ---------------- Registry ----------------
+DETECTORS = {
+    "fast": lambda: FallbackDetector(EnglishSpanishDetector(), LangdetectDetector(), FAST_MIN_CONFIDENCE),
+    "enes": EnglishSpanishDetector,
+    "langdetect": LangdetectDetector,
+}
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+def register_detector(name: str, factory):
+    """Make a detector available under a name (selectable with LANGUAGE_DETECTOR)."""
+    DETECTORS[name] = factory
+
+def get_detector(name: str = None) -> LanguageDetector:
+    """Shared detector instance for a name (default: LANGUAGE_DETECTOR)."""
+    name = name or LANGUAGE_DETECTOR
+    with _detectors_lock:
+        if name not in _detectors:
+            if name not in DETECTORS:
+                raise ValueError(f"Unknown language detector '{name}'; choose from {sorted(DETECTORS)}")
+            _detectors[name] = DETECTORS[name]()
+        return _detectors[name]
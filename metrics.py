@@ -0,0 +1,151 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# ---------------- Metric types ----------------
+# Latency buckets (seconds) shared by every stage histogram
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_key(labelnames, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames, key, extra: dict = None) -> str:
+    pairs = list(zip(labelnames, key)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, None, value) for key, value in sorted(self._values.items())]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {",".join(key) or "total": value for key, value in sorted(self._values.items())}
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][idx] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        rows = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    rows.append((f"{self.name}_bucket", self.labelnames, key, {"le": repr(bound)}, count))
+                rows.append((f"{self.name}_bucket", self.labelnames, key, {"le": "+Inf"}, series["count"]))
+                rows.append((f"{self.name}_sum", self.labelnames, key, None, series["sum"]))
+                rows.append((f"{self.name}_count", self.labelnames, key, None, series["count"]))
+        return rows
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                ",".join(key) or "total": {
+                    "count": series["count"],
+                    "sum": series["sum"],
+                    "mean": series["sum"] / series["count"] if series["count"] else 0.0,
+                    "buckets": dict(zip((repr(b) for b in self.buckets), series["counts"])),
+                }
+                for key, series in sorted(self._series.items())
+            }
+
+# ---------------- Registry ----------------
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labelnames, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable view of every metric."""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+registry = Registry()
+
+# ---------------- Upload pipeline metrics ----------------
+# Stages: queue (admission wait), read (spool upload), extract (text sampling), detect, presign, transfer (S3 upload),
+# sidecar (full-text extraction and upload)
+STAGE_SECONDS = registry.register(Histogram(
+    "upload_stage_seconds", "Time spent in each upload pipeline stage", ["source", "stage"]))
+STAGE_BYTES = registry.register(Counter(
+    "upload_stage_bytes_total", "Bytes processed by each upload pipeline stage", ["source", "stage"]))
+FILES = registry.register(Counter(
+    "upload_files_total", "Files processed, by outcome", ["source", "outcome"]))
+LANGUAGES = registry.register(Counter(
+    "upload_language_total", "Classified documents per detected language", ["source", "language"]))
+FAILURES = registry.register(Counter(
+    "upload_failures_total", "Failures per pipeline stage", ["source", "stage"]))
+DETECTION_CACHE = registry.register(Counter(
+    "upload_detection_cache_total", "Language detections served from the cache or parsed", ["source", "result"]))
+ADMISSION = registry.register(Counter(
+    "upload_admission_total", "Detection requests admitted, queued or rejected by admission control", ["source", "outcome"]))
+
+def record_detection(result, source: str):
+    """
+    Record a DetectionResult. Detection may run in a worker process, so the
+    extract/detect timings travel back on the result and are recorded here.
+    """
+    LANGUAGES.inc(source=source, language=result.language)
+    if result.cached:
+        DETECTION_CACHE.inc(source=source, result="hit")
+        return
+    DETECTION_CACHE.inc(source=source, result="miss")
+    STAGE_SECONDS.observe(result.extract_seconds, source=source, stage="extract")
+    STAGE_SECONDS.observe(result.detect_seconds, source=source, stage="detect")
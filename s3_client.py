@@ -0,0 +1,248 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
+# boto3 is imported on first use, so importing this module stays cheap
+
+# ---------------- Load environment variables ----------------
+load_dotenv()
+
+# ---------------- S3 settings ----------------
+# Shared by the CLI (document_upload.py) and the API (upload_app.py). The CLI used to
+# read BUCKET_NAME/REGION and the API S3_BUCKET_NAME/AWS_REGION; both spellings work
+BUCKET_NAME = os.getenv("BUCKET_NAME") or os.getenv("S3_BUCKET_NAME", "ona-wealth-v1")
+REGION = os.getenv("REGION") or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION", "us-east-1")
+
+# Connections kept open per client; callers size it to their concurrency with set_max_pool_connections
+MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+# Adaptive retries add client-side rate limiting on top of backoff, so a burst of
+# throttled (503 SlowDown) requests slows every worker down instead of retrying in lockstep
+MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "10"))
+RETRY_MODE = os.getenv("S3_RETRY_MODE", "adaptive")
+
+# Ranged reads (S3RangeReader): block size, blocks kept in memory, and the most
+# bytes one reader may fetch before giving up
+RANGE_BLOCK_SIZE = int(os.getenv("S3_RANGE_BLOCK_KB", "256")) * 1024
+RANGE_CACHE_BLOCKS = int(os.getenv("S3_RANGE_CACHE_BLOCKS", "64"))
+RANGE_MAX_BYTES = int(os.getenv("S3_RANGE_MAX_MB", "16")) * 1024 * 1024
+
+# ---------------- Client factory ----------------
+_s3_client = None
+_s3_client_lock = threading.Lock()
+_max_pool_connections = MAX_POOL_CONNECTIONS
+
+def set_max_pool_connections(connections: int):
+    """
+    Size the connection pool for the caller's concurrency. Call it before the
+    client is first used; a client created with a different size is discarded.
+    """
+    global _s3_client, _max_pool_connections
+    with _s3_client_lock:
+        if connections != _max_pool_connections:
+            _max_pool_connections = max(connections, 1)
+            _s3_client = None
+
+def get_s3_client():
+    """Shared S3 client, created (and boto3 imported) on first use."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+                try:
+                    _s3_client = boto3.client(
+                        "s3",
+                        region_name=REGION,
+                        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                        config=Config(
+                            max_pool_connections=_max_pool_connections,
+                            retries={"max_attempts": MAX_ATTEMPTS, "mode": RETRY_MODE},
+                        ),
+                    )
+                    print("✅ S3 client initialized successfully")
+                except Exception as e:
+                    print(f"❌ Failed to initialize S3 client: {e}")
+                    raise
+    return _s3_client
+
+# ---------------- Ensure bucket exists ----------------
+# Buckets already confirmed by this process; they are not probed again
+_known_buckets = set()
+
+def ensure_bucket_exists(bucket: str = None):
+    """
+    Check the bucket with a single HEAD request (instead of listing every
+    bucket in the account) and create it if it is missing.
+    """
+    bucket = bucket or BUCKET_NAME
+    if bucket in _known_buckets:
+        return
+    s3 = get_s3_client()
+    try:
+        s3.head_bucket(Bucket=bucket)
+        print(f"✅ Bucket '{bucket}' already exists.")
+    except NoCredentialsError:
+        print("❌ AWS credentials not found. Check your .env file.")
+        raise
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchBucket"):
+            print(f"❌ Error checking bucket: {e}")
+            raise
+        print(f"ℹ️  Bucket '{bucket}' not found. Creating it...")
+        try:
+            region = s3.meta.region_name
+            # us-east-1 is the default location and must not be passed as a constraint
+            if region == "us-east-1":
+                s3.create_bucket(Bucket=bucket)
+            else:
+                s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": region})
+        except ClientError as e:
+            print(f"❌ Error creating bucket: {e}")
+            raise
+        print(f"✅ Bucket '{bucket}' created successfully.")
+    _known_buckets.add(bucket)
+
+# ---------------- Staging lifecycle ----------------
+# Staged API uploads nobody classifies or discards expire after this many days,
+# as do their unfinished multipart uploads
+STAGING_EXPIRE_DAYS = int(os.getenv("STAGING_EXPIRE_DAYS", "1"))
+STAGING_RULE_ID = "expire-staged-uploads"
+
+def ensure_staging_lifecycle(prefix: str, days: int = STAGING_EXPIRE_DAYS, bucket: str = None) -> bool:
+    """
+    Add a lifecycle rule expiring everything under prefix to the bucket,
+    keeping its other rules. Returns False if the rule could not be added.
+    """
+    bucket = bucket or BUCKET_NAME
+    s3 = get_s3_client()
+    try:
+        try:
+            rules = s3.get_bucket_lifecycle_configuration(Bucket=bucket)["Rules"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NoSuchLifecycleConfiguration":
+                raise
+            rules = []
+        if any(rule.get("ID") == STAGING_RULE_ID for rule in rules):
+            print(f"✅ Staged uploads under '{prefix}/' already expire.")
+            return True
+        rules.append({
+            "ID": STAGING_RULE_ID,
+            "Filter": {"Prefix": f"{prefix}/"},
+            "Status": "Enabled",
+            "Expiration": {"Days": days},
+            "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": days},
+        })
+        s3.put_bucket_lifecycle_configuration(Bucket=bucket, LifecycleConfiguration={"Rules": rules})
+    except (BotoCoreError, ClientError) as e:
+        print(f"❌ Could not add the staging lifecycle rule: {e}")
+        return False
+    print(f"✅ Staged uploads under '{prefix}/' expire after {days} day(s).")
+    return True
+
+# ---------------- Ranged reads ----------------
+class RangeBudgetError(Exception):
+    """
+    A ranged reader needed more bytes than its budget allows. Readers of the
+    object decide what that means (detect_s3_object_language downloads it whole).
+    """
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Read-only, seekable file over an S3 object backed by ranged GETs of
+    fixed-size blocks. Parsers that seek (PyPDF2 to the trailer, zipfile to
+    the central directory) only pull the blocks they touch; recent blocks are
+    cached and the total fetched is capped at max_bytes.
+    """
+
+    def __init__(self, key: str, bucket: str = None, block_size: int = RANGE_BLOCK_SIZE,
+                 cache_blocks: int = RANGE_CACHE_BLOCKS, max_bytes: int = RANGE_MAX_BYTES):
+        super().__init__()
+        self.bucket = bucket or BUCKET_NAME
+        self.key = key
+        self.block_size = block_size
+        self.cache_blocks = max(cache_blocks, 1)
+        self.max_bytes = max_bytes
+        head = get_s3_client().head_object(Bucket=self.bucket, Key=key)
+        self.size = head["ContentLength"]
+        # Every range must come from the same version of the object
+        self.etag = head["ETag"]
+        self.bytes_fetched = 0
+        self.requests = 0
+        self._position = 0
+        self._blocks = OrderedDict()
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.key}"
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def _fetch(self, first: int, last: int):
+        """Fetch blocks first..last (inclusive) with one ranged GET."""
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        if self.bytes_fetched + end - start + 1 > self.max_bytes:
+            raise RangeBudgetError(f"reading {self} needs more than {self.max_bytes / (1024 * 1024):.1f} MB of ranged reads")
+        response = get_s3_client().get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}",
+                                              IfMatch=self.etag)
+        data = response["Body"].read()
+        self.bytes_fetched += len(data)
+        self.requests += 1
+        for index in range(first, last + 1):
+            offset = (index - first) * self.block_size
+            self._blocks[index] = data[offset:offset + self.block_size]
+            self._blocks.move_to_end(index)
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        count = max(0, min(len(view), self.size - self._position))
+        if not count:
+            return 0
+        first = self._position // self.block_size
+        last = (self._position + count - 1) // self.block_size
+        # Contiguous runs of missing blocks are fetched with one request each
+        index = first
+        while index <= last:
+            if index in self._blocks:
+                self._blocks.move_to_end(index)
+                index += 1
+                continue
+            run_end = index
+            while run_end < last and run_end + 1 not in self._blocks and run_end - index + 1 < self.cache_blocks:
+                run_end += 1
+            self._fetch(index, run_end)
+            index = run_end + 1
+
+        copied = 0
+        while copied < count:
+            index, offset = divmod(self._position + copied, self.block_size)
+            if index not in self._blocks:
+                # Evicted by a read larger than the cache
+                self._fetch(index, index)
+            chunk = self._blocks[index][offset:offset + count - copied]
+            view[copied:copied + len(chunk)] = chunk
+            copied += len(chunk)
+        self._position += copied
+        return copied
@@ -0,0 +1,94 @@
+import os
+import gzip
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from botocore.exceptions import ClientError
+from extractors import get_extractor
+from s3_client import BUCKET_NAME, get_s3_client
+
+# ---------------- Sidecar settings ----------------
+# The full text of a tier document, extracted once at upload, is stored next to it as
+# "<key>.text.jsonl.gz": one JSON line per page, {"page": 1, "text": "..."}.
+# Downstream ingestion reads the sidecar instead of parsing the document again
+SIDECAR_SUFFIX = ".text.jsonl.gz"
+SIDECAR_CONTENT_TYPE = "application/gzip"
+# Bumped when the extracted text changes, so existing sidecars are rebuilt
+SIDECAR_VERSION = "1"
+# Opt-in for the API (the CLI uses --sidecars)
+UPLOAD_SIDECARS = os.getenv("UPLOAD_SIDECARS", "0") == "1"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def is_sidecar(key: str) -> bool:
+    return key.endswith(SIDECAR_SUFFIX)
+
+def sidecar_key(key: str) -> str:
+    return f"{key}{SIDECAR_SUFFIX}"
+
+def sidecar_matches(key: str, sha256: str, bucket: str = None) -> bool:
+    """Whether the sidecar at key was built (by this version) from the document with this content hash."""
+    try:
+        head = get_s3_client().head_object(Bucket=bucket or BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    metadata = head.get("Metadata", {})
+    return metadata.get("sha256") == sha256 and metadata.get("sidecar-version") == SIDECAR_VERSION
+
+def build_sidecar(source) -> tuple:
+    """
+    Extract the full text of a document into a gzipped JSONL temp file, one
+    page at a time, so memory holds a single page. Returns (path, format, pages);
+    the caller deletes the file.
+    """
+    extractor = get_extractor(source)
+    pages = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=SIDECAR_SUFFIX) as temp:
+        path = Path(temp.name)
+        try:
+            with gzip.GzipFile(fileobj=temp, mode="wb") as out:
+                for pages, text in enumerate(extractor.iter_pages(source), start=1):
+                    out.write(json.dumps({"page": pages, "text": text}, ensure_ascii=False).encode("utf-8") + b"\n")
+        except BaseException:
+            temp.close()
+            path.unlink(missing_ok=True)
+            raise
+    return path, extractor.name, pages
+
+def upload_sidecar(path: Path, key: str, sha256: str, format: str, pages: int, config=None, bucket: str = None):
+    """Upload a built sidecar to key, tagged with the hash of the document it was built from."""
+    get_s3_client().upload_file(str(path), bucket or BUCKET_NAME, key, Config=config, ExtraArgs={
+        "ContentType": SIDECAR_CONTENT_TYPE,
+        "Metadata": {"sha256": sha256, "format": format, "pages": str(pages), "sidecar-version": SIDECAR_VERSION},
+    })
+
+def sync_s3_sidecar(key: str, sha256: str = None, bucket: str = None) -> bool:
+    """
+    Build the sidecar of a document already in S3 (API uploads). The document
+    is streamed to a temp file, hashing it on the way when the hash is not
+    known, and nothing is parsed if the existing sidecar matches that hash.
+    Returns True if a sidecar was uploaded.
+    """
+    bucket = bucket or BUCKET_NAME
+    target = sidecar_key(key)
+    if sha256 and sidecar_matches(target, sha256, bucket):
+        return False
+    with tempfile.NamedTemporaryFile(suffix=Path(key).suffix) as document:
+        body = get_s3_client().get_object(Bucket=bucket, Key=key)["Body"]
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: body.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            document.write(chunk)
+        document.flush()
+        if sha256 is None:
+            sha256 = digest.hexdigest()
+            if sidecar_matches(target, sha256, bucket):
+                return False
+        path, format, pages = build_sidecar(document.name)
+    try:
+        upload_sidecar(path, target, sha256, format, pages, bucket=bucket)
+    finally:
+        path.unlink(missing_ok=True)
+    return True
@@ -0,0 +1,144 @@
+"""
+AdmissionController (upload_app.py): FIFO grants, the in-flight byte budget,
+the 429/503 rejections and slots handed on by cancelled waiters.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from upload_app import AdmissionController
+
+def controller(concurrency: int = 1, queue_size: int = 4, max_bytes: int = 100,
+               queue_timeout: float = 5) -> AdmissionController:
+    return AdmissionController(concurrency, queue_size, max_bytes, queue_timeout)
+
+async def hold(admission: AdmissionController, name: str, nbytes: int, order: list, release: asyncio.Event,
+               wait: bool = True):
+    async with admission.admit(nbytes, wait):
+        order.append(name)
+        await release.wait()
+
+async def settle():
+    # Let every ready task run until it blocks again
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_waiters_are_granted_in_arrival_order():
+    async def scenario():
+        admission = controller(concurrency=1)
+        order, release = [], asyncio.Event()
+        tasks = []
+        for name in "abc":
+            tasks.append(asyncio.create_task(hold(admission, name, 10, order, release)))
+            await settle()
+        assert order == ["a"] and len(admission._waiters) == 2
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+        assert (admission.active, admission.active_bytes) == (0, 0)
+    asyncio.run(scenario())
+
+def test_byte_budget_limits_concurrency():
+    async def scenario():
+        admission = controller(concurrency=3, max_bytes=100)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(hold(admission, "first", 60, order, release))
+        second = asyncio.create_task(hold(admission, "second", 60, order, release))
+        await settle()
+        # Two slots are free, but the bytes of both do not fit the budget
+        assert order == ["first"] and admission.active_bytes == 60
+        release.set()
+        await asyncio.gather(first, second)
+        assert order == ["first", "second"]
+    asyncio.run(scenario())
+
+def test_document_larger_than_budget_runs_alone():
+    async def scenario():
+        admission = controller(concurrency=2, max_bytes=100)
+        async with admission.admit(500):
+            assert admission.active_bytes == 500
+        assert admission.active_bytes == 0
+    asyncio.run(scenario())
+
+def test_check_rejects_when_queue_is_full():
+    async def scenario():
+        admission = controller(concurrency=1, queue_size=1)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(admission, name, 0, order, release)) for name in "ab"]
+        await settle()
+        with pytest.raises(HTTPException) as error:
+            admission.check()
+        assert error.value.status_code == 429
+        assert int(error.value.headers["Retry-After"]) >= 1
+        # An interactive request is turned away the same way
+        with pytest.raises(HTTPException) as error:
+            async with admission.admit(0):
+                pass
+        assert error.value.status_code == 429
+        release.set()
+        await asyncio.gather(*tasks)
+    asyncio.run(scenario())
+
+def test_check_rejects_bytes_over_budget():
+    async def scenario():
+        admission = controller(concurrency=4, max_bytes=100)
+        admission.check(500)    # nothing running: a large document may run alone
+        async with admission.admit(80):
+            admission.check(20)
+            with pytest.raises(HTTPException) as error:
+                admission.check(21)
+            assert error.value.status_code == 429
+    asyncio.run(scenario())
+
+def test_waiting_too_long_is_503():
+    async def scenario():
+        admission = controller(concurrency=1, queue_timeout=0.01)
+        order, release = [], asyncio.Event()
+        holder = asyncio.create_task(hold(admission, "holder", 0, order, release))
+        await settle()
+        with pytest.raises(HTTPException) as error:
+            async with admission.admit(0):
+                pass
+        assert error.value.status_code == 503
+        assert not admission._waiters
+        release.set()
+        await holder
+        assert admission.active == 0
+    asyncio.run(scenario())
+
+def test_cancelled_after_grant_hands_slot_on():
+    async def scenario():
+        admission = controller(concurrency=1)
+        order, release = [], asyncio.Event()
+        async with admission.admit(0):
+            cancelled = asyncio.create_task(hold(admission, "cancelled", 0, order, release))
+            successor = asyncio.create_task(hold(admission, "successor", 0, order, release))
+            await settle()
+        # The slot was granted to the first waiter, which is cancelled before it resumes
+        cancelled.cancel()
+        await settle()
+        assert order == ["successor"]
+        release.set()
+        await successor
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert (admission.active, admission.active_bytes) == (0, 0)
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_is_skipped():
+    async def scenario():
+        admission = controller(concurrency=1)
+        order, release = [], asyncio.Event()
+        async with admission.admit(0):
+            cancelled = asyncio.create_task(hold(admission, "cancelled", 0, order, release))
+            successor = asyncio.create_task(hold(admission, "successor", 0, order, release))
+            await settle()
+            cancelled.cancel()
+            await settle()
+        await settle()
+        assert order == ["successor"]
+        release.set()
+        await successor
+        assert admission.active == 0
+    asyncio.run(scenario())
@@ -0,0 +1,203 @@
+"""
+Head parsers used while an upload is still streaming (pdf_head_text,
+ooxml_head_text, StreamSampler). Documents are built in code, so each test
+controls exactly how the bytes are laid out.
+"""
+import io
+import os
+import zlib
+import zipfile
+
+import pytest
+
+from extractors import (SAMPLE_MAX_PAGES, STREAM_SAMPLE_STEP, StreamSampler, UnsupportedFormatError,
+                        ooxml_head_text, pdf_head_text)
+
+WORD_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+DRAWING_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+# ---------------- Fixtures ----------------
+class UnseekableBuffer(io.BytesIO):
+    """A write target zipfile cannot seek back into, so it sets flag bit 3 and writes data descriptors."""
+
+    def seek(self, *args):
+        raise OSError("not seekable")
+
+    def seekable(self) -> bool:
+        return False
+
+def document_xml(paragraphs) -> str:
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    return f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{WORD_NS}"><w:body>{body}</w:body></w:document>'
+
+def slide_xml(text: str) -> str:
+    return (f'<?xml version="1.0" encoding="UTF-8"?><p:sld xmlns:p="urn:p" xmlns:a="{DRAWING_NS}">'
+            f"<a:p><a:r><a:t>{text}</a:t></a:r></a:p></p:sld>")
+
+def build_zip(members, method: int = zipfile.ZIP_DEFLATED, streamed: bool = False) -> bytes:
+    """Zip (name, data, method or None) members in order; streamed archives use data descriptors."""
+    buffer = UnseekableBuffer() if streamed else io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", method) as archive:
+        for name, data, member_method in members:
+            archive.writestr(name, data, member_method)
+    return buffer.getvalue()
+
+def build_docx(paragraphs, method: int = zipfile.ZIP_DEFLATED, media: bytes = None, media_method: int = None,
+               streamed: bool = False) -> bytes:
+    members = [("[Content_Types].xml", "<Types/>", None)]
+    if media is not None:
+        members.append(("word/media/image1.png", media, media_method))
+    members.append(("word/document.xml", document_xml(paragraphs), None))
+    return build_zip(members, method, streamed)
+
+def pdf_object(number: int, dictionary: bytes, stream: bytes = None) -> bytes:
+    if stream is None:
+        return b"%d 0 obj\n%s\nendobj\n" % (number, dictionary)
+    return b"%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n" % (number, dictionary, stream)
+
+PARAGRAPHS = [f"Paragraph {n} of a streamed upload." for n in range(200)]
+
+# ---------------- ooxml_head_text ----------------
+@pytest.mark.parametrize("method", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_docx_members_stored_or_deflated(method):
+    head = build_docx(PARAGRAPHS[:3], method)
+    assert ooxml_head_text(head, 1000).split("\n")[:3] == PARAGRAPHS[:3]
+
+def test_docx_with_data_descriptors():
+    head = build_docx(PARAGRAPHS[:3], streamed=True)
+    assert zipfile.ZipFile(io.BytesIO(head)).getinfo("word/document.xml").flag_bits & 0x08
+    assert ooxml_head_text(head, 1000).split("\n")[:3] == PARAGRAPHS[:3]
+
+@pytest.mark.parametrize("media_method", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_docx_media_before_document(media_method):
+    head = build_docx(PARAGRAPHS[:3], media=os.urandom(64 * 1024), media_method=media_method)
+    assert ooxml_head_text(head, 1000).split("\n")[:3] == PARAGRAPHS[:3]
+
+def test_docx_deflated_media_with_data_descriptor_is_skipped():
+    # The media member's end is only found by inflating it
+    head = build_docx(PARAGRAPHS[:3], media=os.urandom(64 * 1024), media_method=zipfile.ZIP_DEFLATED, streamed=True)
+    assert ooxml_head_text(head, 1000).split("\n")[:3] == PARAGRAPHS[:3]
+
+def test_docx_stored_media_with_data_descriptor_stops():
+    # A stored member of unknown size cannot be skipped without scanning for the descriptor
+    head = build_docx(PARAGRAPHS[:3], media=os.urandom(1024), media_method=zipfile.ZIP_STORED, streamed=True)
+    assert ooxml_head_text(head, 1000) == ""
+
+@pytest.mark.parametrize("method", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_docx_truncated_head(method):
+    document = build_docx(PARAGRAPHS, method)
+    text = ooxml_head_text(document[:len(document) // 2], 100_000)
+    lines = [line for line in text.split("\n") if line]
+    assert 0 < len(lines) < len(PARAGRAPHS)
+    # Every paragraph but a possibly cut-off last one comes out whole and in order
+    assert lines[:-1] == PARAGRAPHS[:len(lines) - 1]
+
+def test_docx_head_cut_inside_headers():
+    document = build_docx(PARAGRAPHS[:3])
+    for cut in (0, 4, 20, 40):
+        assert ooxml_head_text(document[:cut], 1000) == ""
+
+def test_docx_stops_at_max_chars():
+    assert ooxml_head_text(build_docx(PARAGRAPHS), 50) == "\n".join(PARAGRAPHS)[:50]
+
+def test_pptx_first_slides_in_zip_order():
+    slides = [(f"ppt/slides/slide{n}.xml", slide_xml(f"Slide {n}"), None) for n in range(1, 7)]
+    head = build_zip([("ppt/presentation.xml", "<p/>", None)] + slides)
+    text = ooxml_head_text(head, 1000)
+    assert text.split() == [word for n in range(1, SAMPLE_MAX_PAGES + 1) for word in ("Slide", str(n))]
+
+def test_xlsx_is_rejected():
+    head = build_zip([("xl/workbook.xml", "<workbook/>", None)])
+    with pytest.raises(UnsupportedFormatError):
+        ooxml_head_text(head, 1000)
+
+# ---------------- pdf_head_text ----------------
+def test_pdf_uncompressed_text_stream():
+    content = b"BT /F1 12 Tf (Hello) Tj (world) Tj ET"
+    head = b"%PDF-1.4\n" + pdf_object(4, b"<< /Length %d >>" % len(content), content)
+    assert pdf_head_text(head, 1000).split() == ["Hello", "world"]
+
+def test_pdf_flate_text_stream():
+    content = zlib.compress(b"BT /F1 12 Tf [(Hel) -20 (lo) -300 (there)] TJ ET")
+    head = b"%PDF-1.4\n" + pdf_object(4, b"<< /Length %d /Filter /FlateDecode >>" % len(content), content)
+    # Small kerning joins the pieces of a word; a large negative one is a word gap
+    assert pdf_head_text(head, 1000).split() == ["Hello", "there"]
+
+def test_pdf_escapes_and_win_ansi():
+    content = rb"BT (Caf\351 \(open\) a\\b) Tj ET"
+    head = b"%PDF-1.4\n" + pdf_object(4, b"<< /Length %d >>" % len(content), content)
+    assert pdf_head_text(head, 1000).strip() == "Café (open) a\\b"
+
+def test_pdf_skips_images_and_other_filters():
+    fake_text = b"BT (hidden) Tj ET"
+    head = (b"%PDF-1.4\n"
+            + pdf_object(4, b"<< /Subtype /Image /Length %d >>" % len(fake_text), fake_text)
+            + pdf_object(5, b"<< /Filter /DCTDecode /Length %d >>" % len(fake_text), fake_text)
+            + pdf_object(6, b"<< /Length 18 >>", b"BT (visible) Tj ET"))
+    assert pdf_head_text(head, 1000).split() == ["visible"]
+
+def test_pdf_truncated_flate_stream():
+    content = zlib.compress(b"".join(b"BT (line %d) Tj ET\n" % n for n in range(2000)))
+    head = b"%PDF-1.4\n" + pdf_object(4, b"<< /Length %d /Filter /FlateDecode >>" % len(content), content)
+    text = pdf_head_text(head[:len(head) // 2], 100_000)
+    lines = text.strip().split("\n")
+    assert 0 < len(lines) < 2000
+    assert [line.strip() for line in lines] == [f"line {n}" for n in range(len(lines))]
+
+def test_pdf_stops_at_max_chars():
+    content = b"".join(b"BT (line %d) Tj ET\n" % n for n in range(100))
+    head = b"%PDF-1.4\n" + pdf_object(4, b"<< /Length %d >>" % len(content), content)
+    assert len(pdf_head_text(head, 30)) == 30
+
+# ---------------- StreamSampler ----------------
+def chunks(data: bytes, size: int = 64 * 1024):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def test_sampler_rejects_legacy_office_early():
+    sampler = StreamSampler()
+    with pytest.raises(UnsupportedFormatError):
+        sampler.feed(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\0" * 100)
+
+def test_sampler_complete_small_document_uses_regular_extractor():
+    document = build_docx(PARAGRAPHS[:3])
+    sampler = StreamSampler()
+    for chunk in chunks(document, 100):
+        sampler.feed(chunk)
+    assert sampler.finish().split("\n")[:3] == PARAGRAPHS[:3]
+    assert sampler.total == len(document)
+
+def test_sampler_asks_for_parses_as_head_grows():
+    document = build_docx(PARAGRAPHS, media=os.urandom(STREAM_SAMPLE_STEP * 3), media_method=zipfile.ZIP_STORED)
+    sampler = StreamSampler()
+    parses = 0
+    for chunk in chunks(document):
+        if sampler.feed(chunk):
+            sampler.update(ooxml_head_text(*sampler.parse_args()[1:3]))
+            parses += 1
+    # One parse per STREAM_SAMPLE_STEP at first, not one per chunk
+    assert 1 <= parses <= len(document) // STREAM_SAMPLE_STEP
+    assert sampler.format == "ooxml"
+
+def test_sampler_keeps_only_max_bytes():
+    document = build_docx(PARAGRAPHS, media=os.urandom(512 * 1024), media_method=zipfile.ZIP_STORED)
+    sampler = StreamSampler(max_bytes=256 * 1024)
+    due = [sampler.feed(chunk) for chunk in chunks(document)]
+    assert len(sampler.head) == 256 * 1024
+    assert sampler.total == len(document)
+    # Until it is parsed, a full head stays due
+    assert due[-1]
+    # The document part lies past the kept head, so nothing can be sampled
+    assert sampler.finish() == ""
+    assert sampler.done and sampler.is_final(complete=True)
+
+def test_sampler_parse_args_round_trip():
+    document = build_docx(PARAGRAPHS)
+    sampler = StreamSampler(max_chars=40)
+    for chunk in chunks(document[:len(document) // 2], 100):
+        sampler.feed(chunk)
+    format, head, max_chars, complete = sampler.parse_args()
+    assert (format, max_chars, complete) == ("ooxml", 40, False)
+    sampler.update(ooxml_head_text(head, max_chars))
+    assert sampler.text == "\n".join(PARAGRAPHS)[:40]
+    assert sampler.is_final()
@@ -0,0 +1,39 @@
+"""
+Debounced watch loop (folder_watch.watch): failing batches do not stop it,
+and changes made before watching starts are reported by the first poll.
+"""
+import threading
+
+from folder_watch import PollingWatcher, watch
+
+class ScriptedWatcher:
+    """Reports one scripted set of changes per poll, then stops the loop."""
+
+    def __init__(self, changes, stop_event: threading.Event):
+        self.changes = list(changes)
+        self.stop_event = stop_event
+
+    def poll(self, timeout: float) -> set:
+        if not self.changes:
+            self.stop_event.set()
+            return set()
+        return self.changes.pop(0)
+
+def test_failed_batch_keeps_watching():
+    stop = threading.Event()
+    batches = []
+
+    def on_batch(paths):
+        batches.append(paths)
+        if len(batches) == 1:
+            raise FileNotFoundError("deleted within the debounce window")
+
+    watcher = ScriptedWatcher([{"a.pdf"}, set(), {"b.pdf"}, set()], stop)
+    watch(watcher, on_batch, debounce=0, max_delay=0, stop_event=stop)
+    assert batches == [["a.pdf"], ["b.pdf"]]
+
+def test_changes_before_first_poll_are_reported(tmp_path):
+    watcher = PollingWatcher([tmp_path], interval=0)
+    # Written while an initial sync would be running, before watch() polls
+    (tmp_path / "new.pdf").write_bytes(b"%PDF-")
+    assert watcher.poll(0) == {tmp_path / "new.pdf"}
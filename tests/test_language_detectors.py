@@ -0,0 +1,33 @@
+"""
+The English/Spanish scorer must stay confident on English and Spanish, and
+defer to the fallback on other languages that share words with Spanish.
+"""
+import pytest
+
+from language_detectors import FAST_MIN_CONFIDENCE, EnglishSpanishDetector
+
+ENGLISH = ("Your monthly budget should cover rent, food and transport first. Compound interest means the returns "
+           "you earn also start earning returns over time. A credit score reflects how reliably you have repaid "
+           "debts in the past.")
+SPANISH = ("Tu presupuesto mensual debe cubrir primero el alquiler, la comida y el transporte. El interés compuesto "
+           "significa que los rendimientos que obtienes también generan rendimientos con el tiempo. La puntuación "
+           "de crédito refleja con qué fiabilidad has pagado tus deudas en el pasado.")
+FRENCH = ("Votre budget mensuel doit d'abord couvrir le loyer, la nourriture et le transport. Les intérêts composés "
+          "signifient que les rendements que vous obtenez génèrent eux aussi des rendements avec le temps. Votre "
+          "cote de crédit reflète la fiabilité avec laquelle vous avez remboursé vos dettes dans le passé.")
+PORTUGUESE = ("O seu orçamento mensal deve cobrir primeiro o aluguel, a comida e o transporte. Os juros compostos "
+              "significam que os rendimentos que você obtém também geram rendimentos com o tempo. A sua pontuação "
+              "de crédito reflete a confiabilidade com que você pagou as suas dívidas no passado.")
+
+@pytest.mark.parametrize("text, code", [(ENGLISH, "en"), (SPANISH, "es")])
+def test_english_and_spanish_are_confident(text, code):
+    detection = EnglishSpanishDetector().detect(text)
+    assert detection.code == code
+    assert detection.confidence >= FAST_MIN_CONFIDENCE
+
+@pytest.mark.parametrize("text", [FRENCH, PORTUGUESE])
+def test_other_romance_languages_defer_to_fallback(text):
+    assert EnglishSpanishDetector().detect(text).confidence < FAST_MIN_CONFIDENCE
+
+def test_no_evidence():
+    assert EnglishSpanishDetector().detect("1234 5678").code == ""
@@ -0,0 +1,111 @@
+"""
+S3RangeReader against an in-process S3 stand-in (moto): block reads and
+coalescing, the block cache, the byte budget and version pinning.
+"""
+import io
+import os
+import zipfile
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import s3_client
+from s3_client import RangeBudgetError, S3RangeReader
+
+BUCKET = "range-reader-test"
+BLOCK = 1024
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+    with moto.mock_aws():
+        # A client created outside the mock would talk to real S3
+        monkeypatch.setattr(s3_client, "_s3_client", None)
+        client = s3_client.get_s3_client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+    monkeypatch.setattr(s3_client, "_s3_client", None)
+
+@pytest.fixture
+def data(s3) -> bytes:
+    body = os.urandom(10 * BLOCK + 123)
+    s3.put_object(Bucket=BUCKET, Key="object.bin", Body=body)
+    return body
+
+def open_reader(**kwargs) -> S3RangeReader:
+    kwargs.setdefault("block_size", BLOCK)
+    return S3RangeReader("object.bin", bucket=BUCKET, **kwargs)
+
+def test_reads_match_object(data):
+    reader = open_reader()
+    assert reader.size == len(data)
+    assert reader.read(10) == data[:10]
+    # Across a block boundary
+    reader.seek(BLOCK - 5)
+    assert reader.read(10) == data[BLOCK - 5:BLOCK + 5]
+    # Relative to the end, and short at the end
+    reader.seek(-50, io.SEEK_END)
+    assert reader.read(100) == data[-50:]
+    assert reader.read(1) == b""
+    reader.seek(3)
+    reader.seek(4, io.SEEK_CUR)
+    assert reader.tell() == 7
+    assert reader.read() == data[7:]
+
+def test_negative_seek_is_rejected(data):
+    with pytest.raises(ValueError):
+        open_reader().seek(-1)
+
+def test_missing_blocks_are_fetched_in_one_request(data):
+    reader = open_reader()
+    assert reader.read(4 * BLOCK) == data[:4 * BLOCK]
+    assert reader.requests == 1
+    assert reader.bytes_fetched == 4 * BLOCK
+
+def test_cached_blocks_are_not_fetched_again(data):
+    reader = open_reader()
+    reader.read(2 * BLOCK)
+    reader.seek(0)
+    assert reader.read(2 * BLOCK) == data[:2 * BLOCK]
+    assert reader.requests == 1
+    # Only the missing tail is fetched when a read overlaps cached blocks
+    reader.seek(BLOCK)
+    assert reader.read(3 * BLOCK) == data[BLOCK:4 * BLOCK]
+    assert reader.requests == 2
+    assert reader.bytes_fetched == 4 * BLOCK
+
+def test_read_larger_than_cache(data):
+    reader = open_reader(cache_blocks=2)
+    assert reader.read() == data
+    assert len(reader._blocks) <= 2
+
+def test_budget_raises_before_fetching(data):
+    reader = open_reader(max_bytes=3 * BLOCK)
+    reader.read(2 * BLOCK)
+    with pytest.raises(RangeBudgetError):
+        reader.read(2 * BLOCK)
+    assert reader.bytes_fetched == 2 * BLOCK
+
+def test_object_replaced_while_reading(s3, data):
+    reader = open_reader()
+    reader.read(BLOCK)
+    s3.put_object(Bucket=BUCKET, Key="object.bin", Body=b"replaced" * 2000)
+    # Ranges must not mix two versions of the object
+    with pytest.raises(s3_client.ClientError) as error:
+        reader.read(BLOCK)
+    assert error.value.response["Error"]["Code"] in ("PreconditionFailed", "412")
+
+def test_zipfile_reads_only_the_blocks_it_needs(s3):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("media/image.png", os.urandom(200 * BLOCK), zipfile.ZIP_STORED)
+        zf.writestr("word/document.xml", "<document/>")
+    s3.put_object(Bucket=BUCKET, Key="object.bin", Body=archive.getvalue())
+    reader = open_reader()
+    with zipfile.ZipFile(reader) as zf:
+        assert zf.read("word/document.xml") == b"<document/>"
+    # The central directory and the text member sit at the end; the media is never read
+    assert reader.bytes_fetched < 10 * BLOCK
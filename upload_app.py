@@ -1,14 +1,211 @@
-from fastapi import FastAPI, UploadFile, Form
+from fastapi import APIRouter, FastAPI, HTTPException, Request, UploadFile, Form
+from fastapi.routing import APIRoute
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import boto3
+from fastapi.responses import PlainTextResponse
+from sse_starlette.sse import EventSourceResponse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from collections import deque
+from pydantic import BaseModel
+from botocore.exceptions import ClientError
+import asyncio
 from pathlib import Path
 import tempfile
+import hashlib
+import threading
+import uuid
+import time
+import json
+import math
 import os
 
 # import your existing functions
-from document_upload import detect_language_from_file
+from document_upload import (detect_downloaded_s3_object, detect_language_details, detect_language_from_text,
+                             detect_s3_object_language, warm_up)
+from extractors import (ExtractionBudgetError, ExtractionError, StreamSampler, UnsupportedFormatError, get_extractor,
+                        sample_head)
+from s3_client import BUCKET_NAME, RANGE_MAX_BYTES, RangeBudgetError, get_s3_client
+from metrics import registry, record_detection, STAGE_SECONDS, STAGE_BYTES, FILES, FAILURES, ADMISSION
+from upload_jobs import JOB_CONCURRENCY, Job, JobStore
+from doc_index import detection_metadata, document_index
+from sidecars import UPLOAD_SIDECARS, sync_s3_sidecar
 
-app = FastAPI()
+# Language detection (PDF parsing + langdetect) runs in worker processes,
+# so a large document never blocks the event loop
+DETECT_WORKERS = int(os.getenv("DETECT_WORKERS", "2"))
+SPOOL_CHUNK_SIZE = 1024 * 1024
+detect_pool = None
+_detect_pool_lock = threading.Lock()
+
+# ---------------- Admission control ----------------
+# Limits per API process on the detection stage: documents being classified at
+# once, documents waiting for a slot, and the bytes of admitted documents.
+# Requests beyond the queue (or waiting too long) are turned away with Retry-After
+DETECT_MAX_CONCURRENCY = int(os.getenv("DETECT_MAX_CONCURRENCY", str(DETECT_WORKERS)))
+DETECT_MAX_QUEUE = int(os.getenv("DETECT_MAX_QUEUE", "16"))
+DETECT_MAX_INFLIGHT_BYTES = int(os.getenv("DETECT_MAX_INFLIGHT_MB", "256")) * 1024 * 1024
+DETECT_QUEUE_TIMEOUT = float(os.getenv("DETECT_QUEUE_TIMEOUT", "10"))
+
+class AdmissionController:
+    """
+    Bounded FIFO admission for detection work. A document is admitted while
+    fewer than `concurrency` run and its bytes fit the in-flight budget (a
+    document larger than the whole budget runs alone).
+    """
+
+    def __init__(self, concurrency: int, queue_size: int, max_bytes: int, queue_timeout: float):
+        self.concurrency = max(concurrency, 1)
+        self.queue_size = queue_size
+        self.max_bytes = max_bytes
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.active_bytes = 0
+        self._waiters = deque()
+        # Moving average of how long admitted work holds its slot, for Retry-After
+        self._hold_seconds = 1.0
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.active < self.concurrency and (self.active == 0 or self.active_bytes + nbytes <= self.max_bytes)
+
+    def _grant(self, nbytes: int):
+        self.active += 1
+        self.active_bytes += nbytes
+
+    def _release(self, nbytes: int):
+        self.active -= 1
+        self.active_bytes -= nbytes
+        while self._waiters and self._fits(self._waiters[0][0]):
+            waiting_bytes, future = self._waiters.popleft()
+            # Waiters that timed out or disconnected were cancelled and are skipped
+            if not future.done():
+                self._grant(waiting_bytes)
+                future.set_result(None)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._hold_seconds * (len(self._waiters) + 1) / self.concurrency))
+
+    def _reject(self, status_code: int, detail: str):
+        ADMISSION.inc(source="api", outcome="rejected")
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    def check(self, nbytes: int = 0):
+        """
+        Turn a request away (429) before it admits any document: the queue is
+        already full, or its nbytes would not fit the in-flight budget next to
+        the documents being classified.
+        """
+        if len(self._waiters) >= self.queue_size:
+            self._reject(429, "Too many documents waiting for language detection, retry later")
+        if self.active and self.active_bytes + nbytes > self.max_bytes:
+            self._reject(429, "Too many bytes being classified, retry later")
+
+    async def _acquire(self, nbytes: int, wait: bool):
+        if not self._waiters and self._fits(nbytes):
+            self._grant(nbytes)
+            ADMISSION.inc(source="api", outcome="admitted")
+            return
+        if not wait:
+            self.check()
+
+        entry = (nbytes, asyncio.get_running_loop().create_future())
+        self._waiters.append(entry)
+        ADMISSION.inc(source="api", outcome="queued")
+        try:
+            with STAGE_SECONDS.time(source="api", stage="queue"):
+                await asyncio.wait_for(entry[1], None if wait else self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject(503, "Language detection is saturated, retry later")
+        except BaseException:
+            # Cancelled right after being granted a slot: hand it on
+            if entry[1].done() and not entry[1].cancelled():
+                self._release(nbytes)
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+        ADMISSION.inc(source="api", outcome="admitted")
+
+    @asynccontextmanager
+    async def admit(self, nbytes: int, wait: bool = False):
+        """
+        Hold a detection slot for a document of nbytes. Interactive requests
+        are rejected (429 queue full, 503 waited too long); background work
+        and requests that already passed check() pass wait=True and queue
+        without limit.
+        """
+        await self._acquire(nbytes, wait)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.perf_counter() - start)
+            self._release(nbytes)
+
+admission = AdmissionController(DETECT_MAX_CONCURRENCY, DETECT_MAX_QUEUE, DETECT_MAX_INFLIGHT_BYTES, DETECT_QUEUE_TIMEOUT)
+
+# Upload types whose content is classified; the others never touch the controller
+TIER_PREFIXES = {"Tier1": "Tier 1", "Tier2": "Tier 2"}
+
+class AdmissionRoute(APIRoute):
+    """
+    Route whose Tier requests pass admission.check() with their Content-Length
+    before the body is read. FastAPI parses forms before dependencies run, so
+    a dependency could only turn a request away after receiving all of it.
+    Only a type in the query string is known this early (/api/upload-stream;
+    form clients may repeat theirs there); other requests are limited by
+    admission.admit() once their type is read.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def checked_handler(request: Request):
+            if request.query_params.get("type") in TIER_PREFIXES:
+                content_length = request.headers.get("content-length", "")
+                admission.check(int(content_length) if content_length.isdigit() else 0)
+            return await handler(request)
+
+        return checked_handler
+
+# Endpoints that classify the documents they receive; included in the app at the end of this module
+detect_routes = APIRouter(route_class=AdmissionRoute)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global detect_pool
+    # Warm up before serving: start the detection workers (each loads the
+    # langdetect profiles once) and create the S3 client, so the first
+    # request does not pay for either
+    detect_pool = ProcessPoolExecutor(max_workers=DETECT_WORKERS, initializer=warm_up)
+    await asyncio.get_running_loop().run_in_executor(detect_pool, warm_up)
+    await run_in_threadpool(get_s3_client)
+    yield
+    detect_pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_detection(function, *args):
+    """
+    Run function(*args) in the detection pool. A worker that dies (out of
+    memory, a crash in native parser code) breaks the whole pool: it is then
+    replaced, and the request that hit it gets a 503 it can retry.
+    """
+    global detect_pool
+    pool = detect_pool
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, function, *args)
+    except BrokenProcessPool:
+        with _detect_pool_lock:
+            # Requests that hit the same broken pool replace it only once
+            if detect_pool is pool:
+                print("⚠️  A detection worker died - restarting the detection pool")
+                detect_pool = ProcessPoolExecutor(max_workers=DETECT_WORKERS, initializer=warm_up)
+                pool.shutdown(wait=False, cancel_futures=True)
+        FAILURES.inc(source="api", stage="detect")
+        raise HTTPException(status_code=503, detail="Language detection restarted, retry later",
+                            headers={"Retry-After": str(admission.retry_after())})
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS - allows frontend to talk to backend
 app.add_middleware(
@@ -19,15 +216,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Get AWS credentials from environment variables (Railway will provide these)
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION", "us-east-1")
-)
-BUCKET = os.getenv("S3_BUCKET_NAME", "ona-wealth-v1")
-
 @app.get("/")
 async def root():
     return {"status": "healthy", "service": "Ona Upload API"}
@@ -36,33 +224,639 @@ async def root():
 async def health():
     return {"status": "ok"}
 
-@app.post("/api/get-upload-url")
-async def get_upload_url(file: UploadFile, type: str = Form(...)):
-    temp_path = Path(tempfile.gettempdir()) / file.filename
-    with open(temp_path, "wb") as f:
-        f.write(await file.read())
+@app.get("/metrics")
+async def metrics():
+    """Per-stage timings, byte counts and outcomes in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def spool_upload(file: UploadFile, max_bytes: int = None) -> Path:
+    """
+    Copy an upload to a uniquely named temp file in fixed-size chunks. With
+    max_bytes, the copy stops with ExtractionBudgetError once the upload is larger.
+    """
+    file.file.seek(0)
+    with STAGE_SECONDS.time(source="api", stage="read"), \
+            tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as spool:
+        try:
+            for chunk in iter(lambda: file.file.read(SPOOL_CHUNK_SIZE), b""):
+                if max_bytes is not None and spool.tell() + len(chunk) > max_bytes:
+                    raise ExtractionBudgetError(f"upload exceeds the {max_bytes / (1024 * 1024):.1f} MB budget")
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            Path(spool.name).unlink(missing_ok=True)
+            raise
+        STAGE_BYTES.inc(spool.tell(), source="api", stage="read")
+    return Path(spool.name)
+
+def upload_path(file: UploadFile):
+    """
+    The upload's own spool file, if Starlette rolled it over to a named file
+    on disk (platforms whose temp files have a path); None otherwise.
+    """
+    name = getattr(file.file, "name", None)
+    return Path(name) if isinstance(name, str) and os.path.isfile(name) else None
+
+def extraction_http_error(error: ExtractionError) -> HTTPException:
+    status_code = 413 if isinstance(error, ExtractionBudgetError) else 415
+    return HTTPException(status_code=status_code, detail=str(error))
+
+async def detect_upload(file: UploadFile, wait: bool = False):
+    """
+    Spool the upload off the event loop, then classify it in the detection
+    pool (returns a DetectionResult). wait is passed on to admission.admit.
+    """
+    try:
+        # Reject unsupported content from its first bytes, before spooling it anywhere
+        extractor = await run_in_threadpool(get_extractor, file.file)
+    except UnsupportedFormatError as e:
+        FAILURES.inc(source="api", stage="extract")
+        raise extraction_http_error(e)
 
+    # Admitted before spooling, so a burst of uploads cannot pile up on disk or in the pool
+    async with admission.admit(file.size or 0, wait):
+        # The detection workers need a path: Starlette's own spool file when it has
+        # one, otherwise a copy that stops at the format's size budget
+        path = upload_path(file)
+        if path is None:
+            try:
+                temp_path = await run_in_threadpool(spool_upload, file, extractor.max_bytes)
+            except ExtractionError as e:
+                FAILURES.inc(source="api", stage="extract")
+                raise extraction_http_error(e)
+        try:
+            return await classify_spooled(path or temp_path)
+        finally:
+            if path is None:
+                temp_path.unlink(missing_ok=True)
+
+async def classify_spooled(temp_path: Path):
+    """Classify a spooled document in the detection pool (returns a DetectionResult)."""
+    try:
+        result = await run_detection(detect_language_details, temp_path)
+    except ExtractionError as e:
+        FAILURES.inc(source="api", stage="extract")
+        raise extraction_http_error(e)
+    except HTTPException:
+        raise
+    except Exception:
+        FAILURES.inc(source="api", stage="detect")
+        raise
+    record_detection(result, "api")
+    return result
+
+async def resolve_prefix(file: UploadFile, type: str, wait: bool = False):
+    """
+    S3 prefix for an upload and, for Tier documents, their DetectionResult
+    (None otherwise); only Tier documents need their content read.
+    """
     if type == "personality":
-        prefix = "personality"
+        return "personality", None
     elif type == "instructions":
-        prefix = "instructions"
+        return "instructions", None
     elif type == "Tier1":
-        lang = detect_language_from_file(temp_path)
-        prefix = f"Tier 1-{lang}"
+        detection = await detect_upload(file, wait)
+        return f"Tier 1-{detection.language}", detection
     elif type == "Tier2":
-        lang = detect_language_from_file(temp_path)
-        prefix = f"Tier 2-{lang}"
+        detection = await detect_upload(file, wait)
+        return f"Tier 2-{detection.language}", detection
     else:
-        prefix = "others"
+        return "others", None
+
+def presign_put(key: str, metadata: dict = None) -> str:
+    params = {"Bucket": BUCKET_NAME, "Key": key}
+    if metadata:
+        params["Metadata"] = metadata
+    with STAGE_SECONDS.time(source="api", stage="presign"):
+        url = get_s3_client().generate_presigned_url(
+            "put_object",
+            Params=params,
+            ExpiresIn=3600
+        )
+    FILES.inc(source="api", outcome="presigned")
+    return url
 
+def presigned_upload(key: str, detection=None, sign_metadata: bool = False) -> dict:
+    """
+    Upload URL and key for a document. With sign_metadata, a classified
+    document's detection is stored as object metadata; it becomes part of the
+    signature, so the client must send the returned headers with its PUT.
+    Without it the URL takes a plain PUT, as it always has.
+    """
+    metadata = detection_metadata(detection) if detection and sign_metadata else {}
+    upload = {"uploadUrl": presign_put(key, metadata), "key": key}
+    if metadata:
+        upload["headers"] = {f"x-amz-meta-{name}": value for name, value in metadata.items()}
+    return upload
+
+@detect_routes.post("/api/get-upload-url")
+async def get_upload_url(file: UploadFile, type: str = Form(...), signMetadata: bool = Form(False)):
+    prefix, detection = await resolve_prefix(file, type)
     key = f"{prefix}/{file.filename}"
 
-    url = s3.generate_presigned_url(
-        "put_object",
-        Params={"Bucket": BUCKET, "Key": key},
-        ExpiresIn=3600
+    return presigned_upload(key, detection, signMetadata)
+
+@detect_routes.post("/api/get-upload-urls")
+async def get_upload_urls(files: list[UploadFile], type: str = Form(...), signMetadata: bool = Form(False)):
+    """
+    Presign many uploads in one request. Tier documents are classified in
+    parallel on the detection pool; a file that fails is reported on its own
+    entry without failing the batch.
+    """
+    # A Tier batch is turned away only if the queue is full when it arrives; its
+    # files then queue for their slots instead of competing with each other
+    if type in TIER_PREFIXES:
+        admission.check()
+
+    async def presign_one(file: UploadFile) -> dict:
+        try:
+            prefix, detection = await resolve_prefix(file, type, wait=True)
+        except HTTPException as e:
+            FILES.inc(source="api", outcome="failed")
+            failure = {"filename": file.filename, "error": e.detail, "status": e.status_code}
+            if e.headers and "Retry-After" in e.headers:
+                failure["retryAfter"] = int(e.headers["Retry-After"])
+            return failure
+        except Exception as e:
+            FILES.inc(source="api", outcome="failed")
+            return {"filename": file.filename, "error": f"Language detection failed: {e}"}
+        key = f"{prefix}/{file.filename}"
+        return {"filename": file.filename, **presigned_upload(key, detection, signMetadata)}
+
+    uploads = await asyncio.gather(*(presign_one(file) for file in files))
+    return {"uploads": uploads}
+
+# ---------------- Presigned multipart uploads ----------------
+# Clients upload large documents as parts straight to S3: create the upload,
+# presign part URLs in batches, PUT parts concurrently, then complete (or abort)
+MAX_PRESIGN_PARTS = 1000
+
+class MultipartCreate(BaseModel):
+    key: str
+    # S3 user metadata, e.g. the x-amz-meta-* headers returned with a presigned upload (without the prefix)
+    metadata: dict[str, str] = {}
+
+class MultipartPresign(BaseModel):
+    key: str
+    uploadId: str
+    partNumbers: list[int]
+
+class CompletedPart(BaseModel):
+    PartNumber: int
+    ETag: str
+
+class MultipartComplete(BaseModel):
+    key: str
+    uploadId: str
+    parts: list[CompletedPart]
+
+class MultipartAbort(BaseModel):
+    key: str
+    uploadId: str
+
+@app.post("/api/multipart/create")
+async def create_multipart_upload(body: MultipartCreate):
+    response = await run_in_threadpool(get_s3_client().create_multipart_upload,
+                                       Bucket=BUCKET_NAME, Key=body.key, Metadata=body.metadata)
+    return {"uploadId": response["UploadId"], "key": body.key}
+
+@app.post("/api/multipart/presign-parts")
+async def presign_multipart_parts(body: MultipartPresign):
+    if len(body.partNumbers) > MAX_PRESIGN_PARTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PRESIGN_PARTS} parts per request")
+    if any(not 1 <= number <= 10000 for number in body.partNumbers):
+        raise HTTPException(status_code=400, detail="Part numbers must be between 1 and 10000")
+
+    def presign_parts() -> dict:
+        s3 = get_s3_client()
+        return {
+            number: s3.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": BUCKET_NAME, "Key": body.key, "UploadId": body.uploadId, "PartNumber": number},
+                ExpiresIn=3600
+            )
+            for number in body.partNumbers
+        }
+
+    # Up to MAX_PRESIGN_PARTS signatures take long enough to stall the event loop
+    return {"urls": await run_in_threadpool(presign_parts)}
+
+@app.post("/api/multipart/complete")
+async def complete_multipart_upload(body: MultipartComplete):
+    parts = sorted(({"PartNumber": part.PartNumber, "ETag": part.ETag} for part in body.parts),
+                   key=lambda part: part["PartNumber"])
+    await run_in_threadpool(
+        get_s3_client().complete_multipart_upload,
+        Bucket=BUCKET_NAME, Key=body.key, UploadId=body.uploadId, MultipartUpload={"Parts": parts},
     )
-    
-    temp_path.unlink(missing_ok=True)
+    await run_in_threadpool(document_index.record_object, body.key)
+    return {"key": body.key}
+
+class UploadComplete(BaseModel):
+    key: str
+
+@app.post("/api/complete-upload")
+async def complete_upload(body: UploadComplete):
+    """
+    Report a presigned PUT as done. The API never sees such a PUT land, so
+    this is how the object gets into the document index (multipart uploads
+    are recorded by /api/multipart/complete).
+    """
+    try:
+        await run_in_threadpool(document_index.record_object, body.key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        raise
+    return {"key": body.key}
+
+@app.post("/api/multipart/abort")
+async def abort_multipart_upload(body: MultipartAbort):
+    await run_in_threadpool(get_s3_client().abort_multipart_upload, Bucket=BUCKET_NAME, Key=body.key, UploadId=body.uploadId)
+    return {"key": body.key, "aborted": True}
+
+# ---------------- Text sidecars ----------------
+# With UPLOAD_SIDECARS=1, tier documents stored by the API get their text sidecar
+# (see sidecars.py) built in the background, after the response has been sent
+sidecar_tasks = set()
+
+async def build_sidecar_later(key: str, sha256: str = None):
+    try:
+        # The document is read from S3 to disk, so the slot holds no document bytes
+        async with admission.admit(0, wait=True):
+            with STAGE_SECONDS.time(source="api", stage="sidecar"):
+                await run_detection(sync_s3_sidecar, key, sha256)
+    except Exception as e:
+        print(f"⚠️  No text sidecar for {key}: {e}")
+        FAILURES.inc(source="api", stage="sidecar")
+
+def schedule_sidecar(key: str, sha256: str = None):
+    if UPLOAD_SIDECARS:
+        # The event loop only keeps weak references to tasks
+        task = asyncio.create_task(build_sidecar_later(key, sha256))
+        sidecar_tasks.add(task)
+        task.add_done_callback(sidecar_tasks.discard)
+
+# ---------------- Streaming proxy upload ----------------
+# The browser sends a document once: the request body is streamed into S3 while
+# its first bytes are sampled for language detection
+PROXY_PART_SIZE = max(int(os.getenv("PROXY_PART_SIZE_MB", "8")), 5) * 1024 * 1024    # S3 parts are >= 5 MiB
+PROXY_PARTS_IN_FLIGHT = int(os.getenv("PROXY_PARTS_IN_FLIGHT", "2"))
+# Where a document waits when its first bytes were not enough to classify it
+PROXY_STAGING_PREFIX = os.getenv("PROXY_STAGING_PREFIX", "_incoming")
+
+class ProxyUpload:
+    """S3 multipart upload fed one part at a time, with a bounded number of parts in flight."""
+
+    def __init__(self, key: str, metadata: dict = None):
+        self.key = key
+        self.metadata = metadata or {}
+        self.upload_id = None
+        self.parts = []
+        self._next_part = 1
+        self._in_flight = []
+
+    async def start(self):
+        response = await run_in_threadpool(get_s3_client().create_multipart_upload,
+                                           Bucket=BUCKET_NAME, Key=self.key, Metadata=self.metadata)
+        self.upload_id = response["UploadId"]
+
+    async def _upload_part(self, number: int, data: bytes):
+        response = await run_in_threadpool(
+            get_s3_client().upload_part,
+            Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=data,
+        )
+        self.parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    async def add_part(self, data: bytes):
+        # Waiting for the oldest part keeps memory per request at a few parts
+        if len(self._in_flight) >= PROXY_PARTS_IN_FLIGHT:
+            await self._in_flight.pop(0)
+        self._in_flight.append(asyncio.create_task(self._upload_part(self._next_part, data)))
+        self._next_part += 1
+
+    async def complete(self):
+        await asyncio.gather(*self._in_flight)
+        self._in_flight = []
+        parts = sorted(self.parts, key=lambda part: part["PartNumber"])
+        await run_in_threadpool(
+            get_s3_client().complete_multipart_upload,
+            Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": parts},
+        )
+
+    async def abort(self):
+        for task in self._in_flight:
+            task.cancel()
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self.upload_id is not None:
+            await run_in_threadpool(get_s3_client().abort_multipart_upload,
+                                    Bucket=BUCKET_NAME, Key=self.key, UploadId=self.upload_id)
+
+async def parse_stream_head(sampler: StreamSampler, complete: bool = False) -> str:
+    """
+    The sample of a streamed document, parsing its head in the detection pool
+    unless the sample is already final. Callers hold a detection slot.
+    """
+    if not sampler.is_final(complete):
+        sampler.update(await run_detection(sample_head, *sampler.parse_args(complete)))
+    return sampler.text
+
+async def classify_stream(sampler: StreamSampler, name: str, complete: bool):
+    """DetectionResult for a streamed document from its sampled head, computed in the detection pool."""
+    # The request passed admission.check() and its body is arriving, so it waits for a slot
+    async with admission.admit(len(sampler.head), wait=True):
+        start = time.perf_counter()
+        try:
+            text = await parse_stream_head(sampler, complete)
+        except ExtractionError as e:
+            FAILURES.inc(source="api", stage="extract")
+            raise extraction_http_error(e)
+        extract_seconds = time.perf_counter() - start
+        result = await run_detection(detect_language_from_text, text, name)
+    return result._replace(extract_seconds=extract_seconds)
+
+@detect_routes.post("/api/upload-stream")
+async def upload_stream(request: Request, filename: str, type: str):
+    """
+    Single-pass upload: the raw request body is streamed to S3 as it arrives.
+    Tier documents are classified from their first bytes, so the final key is
+    usually known before the first part is sent; otherwise the document is
+    staged, classified once complete, and copied server-side to its final key.
+    """
+    name = Path(filename).name
+    tier = TIER_PREFIXES.get(type)
+    # Non-tier prefixes do not depend on the content
+    key = None
+    if not tier:
+        prefix, _ = await resolve_prefix(None, type)
+        key = f"{prefix}/{name}"
+    sampler = StreamSampler() if tier else None
+    result = None
+    upload = None
+    buffer = bytearray()
+    total = 0
+    # The content hash is only known once the body is complete, so it cannot be
+    # set on a multipart upload whose key was decided from the first part
+    digest = hashlib.sha256()
+    try:
+        with STAGE_SECONDS.time(source="api", stage="proxy"):
+            async for chunk in request.stream():
+                total += len(chunk)
+                digest.update(chunk)
+                if sampler is not None:
+                    try:
+                        # feed() only buffers; parsing the head is detection work, done in the pool
+                        if sampler.feed(chunk):
+                            async with admission.admit(len(sampler.head), wait=True):
+                                await parse_stream_head(sampler)
+                    except ExtractionError as e:
+                        FAILURES.inc(source="api", stage="extract")
+                        raise extraction_http_error(e)
+                buffer += chunk
+                if len(buffer) < PROXY_PART_SIZE:
+                    continue
+                if upload is None:
+                    if key is None and sampler.done and sampler.text.strip():
+                        result = await classify_stream(sampler, name, complete=False)
+                        if result.code:
+                            key = f"{tier}-{result.language}/{name}"
+                    upload = ProxyUpload(key or f"{PROXY_STAGING_PREFIX}/{uuid.uuid4().hex}/{name}",
+                                         detection_metadata(result) if key and result else None)
+                    await upload.start()
+                await upload.add_part(bytes(buffer))
+                buffer.clear()
+
+            if upload is None:
+                # Smaller than one part: a single PUT once the language is known
+                metadata = {}
+                if key is None:
+                    result = await classify_stream(sampler, name, complete=True)
+                    result = result._replace(sha256=digest.hexdigest())
+                    key = f"{tier}-{result.language}/{name}"
+                    metadata = detection_metadata(result)
+                await run_in_threadpool(get_s3_client().put_object, Bucket=BUCKET_NAME, Key=key, Body=bytes(buffer),
+                                        Metadata=metadata)
+            else:
+                if buffer:
+                    await upload.add_part(bytes(buffer))
+                await upload.complete()
+    except BaseException:
+        if upload is not None:
+            await upload.abort()
+        raise
+
+    staged = key is None
+    if staged:
+        s3 = get_s3_client()
+        try:
+            # The head is parsed once, off the event loop, by classify_stream
+            result = await classify_stream(sampler, name, complete=True)
+            if not result.code:
+                # The head held no usable text: classify the stored object itself
+                try:
+                    # The body is already stored, so wait for a slot rather than reject it
+                    async with admission.admit(total, wait=True):
+                        result = await run_detection(detect_s3_object_language, upload.key)
+                except ExtractionError as e:
+                    FAILURES.inc(source="api", stage="extract")
+                    raise extraction_http_error(e)
+            result = result._replace(sha256=digest.hexdigest())
+            key = f"{tier}-{result.language}/{name}"
+            await run_in_threadpool(s3.copy, {"Bucket": BUCKET_NAME, "Key": upload.key}, BUCKET_NAME, key,
+                                    ExtraArgs={"Metadata": detection_metadata(result), "MetadataDirective": "REPLACE"})
+        finally:
+            await run_in_threadpool(s3.delete_object, Bucket=BUCKET_NAME, Key=upload.key)
+
+    await run_in_threadpool(document_index.record_object, key)
+    if tier:
+        schedule_sidecar(key, digest.hexdigest())
+    STAGE_BYTES.inc(total, source="api", stage="transfer")
+    FILES.inc(source="api", outcome="uploaded")
+    response = {"key": key, "bytes": total}
+    if result is not None:
+        record_detection(result, "api")
+        response.update(language=result.language, staged=staged)
+    return response
+
+# ---------------- Staged uploads ----------------
+# Tier documents PUT straight to a staging key; the backend then classifies the
+# stored object with ranged reads and moves it to its Tier folder, so the
+# document never passes through the API
+class StagedUploadRequest(BaseModel):
+    filename: str
+    type: str
+
+class ClassifyStaged(BaseModel):
+    key: str
+    type: str
+
+class DiscardStaged(BaseModel):
+    key: str
+
+# Staged objects nobody classifies or discards (the client gave up or went away)
+# are expired by a bucket lifecycle rule, added once at deployment with
+# `python document_upload.py --expire-staged`; the API never changes bucket settings
+
+def tier_prefix(type: str) -> str:
+    if type not in TIER_PREFIXES:
+        raise HTTPException(status_code=400, detail=f"Staged uploads are for {' and '.join(TIER_PREFIXES)} documents")
+    return TIER_PREFIXES[type]
+
+def check_staged_key(key: str):
+    if not key.startswith(f"{PROXY_STAGING_PREFIX}/"):
+        raise HTTPException(status_code=400, detail="Only staged uploads can be classified or discarded")
+
+@app.post("/api/staged-upload-url")
+async def get_staged_upload_url(body: StagedUploadRequest):
+    """Presign a PUT to a fresh staging key; large files can use the multipart endpoints with that key."""
+    tier_prefix(body.type)
+    key = f"{PROXY_STAGING_PREFIX}/{uuid.uuid4().hex}/{Path(body.filename).name}"
+    return presigned_upload(key)
+
+@app.post("/api/classify-staged")
+async def classify_staged(body: ClassifyStaged):
+    """
+    Classify a staged object from S3 and move it to "Tier N-<language>/" with
+    a server-side copy. Unsupported documents are deleted from staging; on
+    other failures the object stays, so the call can be retried.
+    """
+    tier = tier_prefix(body.type)
+    check_staged_key(body.key)
+    s3 = get_s3_client()
+
+    async def detect(function, *args):
+        try:
+            return await run_detection(function, body.key, *args)
+        except ExtractionError as e:
+            FAILURES.inc(source="api", stage="extract")
+            FILES.inc(source="api", outcome="failed")
+            await run_in_threadpool(s3.delete_object, Bucket=BUCKET_NAME, Key=body.key)
+            raise extraction_http_error(e)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise HTTPException(status_code=404, detail="Staged upload not found")
+            FAILURES.inc(source="api", stage="detect")
+            raise
+        except (RangeBudgetError, HTTPException):
+            raise
+        except Exception:
+            FAILURES.inc(source="api", stage="detect")
+            raise
+
+    try:
+        # A ranged-read classification holds at most RANGE_MAX_BYTES
+        async with admission.admit(RANGE_MAX_BYTES):
+            result = await detect(detect_s3_object_language, False)
+    except RangeBudgetError as e:
+        print(f"   ℹ️  {e}; downloading the whole object")
+        size = (await run_in_threadpool(s3.head_object, Bucket=BUCKET_NAME, Key=body.key))["ContentLength"]
+        # The download is admitted with its real size; having been admitted once, it waits instead of failing
+        async with admission.admit(size, wait=True):
+            result = await detect(detect_downloaded_s3_object)
+    record_detection(result, "api")
+
+    key = f"{tier}-{result.language}/{Path(body.key).name}"
+    # Ranged reads leave no content hash to record; a downloaded document has one
+    await run_in_threadpool(s3.copy, {"Bucket": BUCKET_NAME, "Key": body.key}, BUCKET_NAME, key,
+                            ExtraArgs={"Metadata": detection_metadata(result), "MetadataDirective": "REPLACE"})
+    await run_in_threadpool(s3.delete_object, Bucket=BUCKET_NAME, Key=body.key)
+    await run_in_threadpool(document_index.record_object, key)
+    schedule_sidecar(key)
+    FILES.inc(source="api", outcome="uploaded")
+    return {"key": key, "language": result.language}
+
+@app.post("/api/discard-staged")
+async def discard_staged(body: DiscardStaged):
+    """Delete a staged upload that will not be classified (e.g. the client ran out of retries)."""
+    check_staged_key(body.key)
+    await run_in_threadpool(get_s3_client().delete_object, Bucket=BUCKET_NAME, Key=body.key)
+    return {"key": body.key, "discarded": True}
+
+# ---------------- Background upload jobs ----------------
+# A batch is submitted once and answered with a job id right away; background
+# tasks classify and presign its files, and every outcome is streamed to the
+# client over Server-Sent Events as soon as it is ready
+jobs = JobStore()
+
+async def run_job(job: Job, paths: list, sign_metadata: bool = False):
+    """Classify and presign every file of a job, publishing each outcome as it is ready."""
+    semaphore = asyncio.Semaphore(JOB_CONCURRENCY)
+
+    async def process(index: int, filename: str, temp_path):
+        async with semaphore:
+            try:
+                if temp_path is None:
+                    prefix, detection = await resolve_prefix(None, job.type)
+                else:
+                    # Background work waits for a detection slot instead of being turned away
+                    async with admission.admit(temp_path.stat().st_size, wait=True):
+                        detection = await classify_spooled(temp_path)
+                    prefix = f"{TIER_PREFIXES[job.type]}-{detection.language}"
+                key = f"{prefix}/{filename}"
+                result = {"filename": filename, **presigned_upload(key, detection, sign_metadata)}
+            except HTTPException as e:
+                FILES.inc(source="api", outcome="failed")
+                result = {"filename": filename, "error": e.detail, "status": e.status_code}
+            except Exception as e:
+                FILES.inc(source="api", outcome="failed")
+                result = {"filename": filename, "error": f"Language detection failed: {e}"}
+            finally:
+                if temp_path is not None:
+                    temp_path.unlink(missing_ok=True)
+            job.file_done(index, result)
+
+    job.start()
+    try:
+        await asyncio.gather(*(process(index, filename, path)
+                               for index, (filename, path) in enumerate(zip(job.filenames, paths))))
+    finally:
+        job.finish()
+
+def get_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(files: list[UploadFile], type: str = Form(...), signMetadata: bool = Form(False)):
+    """
+    Submit a batch and return its job id immediately. Follow the job on
+    /api/jobs/{id}/events; each file gets an upload URL (or an error) there.
+    """
+    # Uploaded files are closed when this request ends, so Tier documents are spooled now
+    paths = []
+    try:
+        for file in files:
+            paths.append(await run_in_threadpool(spool_upload, file) if type in TIER_PREFIXES else None)
+    except BaseException:
+        for path in paths:
+            if path is not None:
+                path.unlink(missing_ok=True)
+        raise
+    job = jobs.create([file.filename for file in files], type)
+    job.task = asyncio.create_task(run_job(job, paths, signMetadata))
+    return {"jobId": job.id, "files": len(files), "events": f"/api/jobs/{job.id}/events"}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    return get_job(job_id).snapshot()
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Job progress as Server-Sent Events: "job" when work starts, one "file" per
+    finished file and "done" at the end. Earlier events are replayed first, and
+    a reconnecting client resumes after its Last-Event-ID.
+    """
+    job = get_job(job_id)
+    last_event_id = request.headers.get("last-event-id", "")
+    cursor = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    async def events():
+        async for sequence, event, data in job.events_from(cursor):
+            yield {"id": str(sequence), "event": event, "data": json.dumps(data)}
+
+    return EventSourceResponse(events())
 
-    return {"uploadUrl": url, "key": key}
+app.include_router(detect_routes)
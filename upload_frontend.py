@@ -1,9 +1,202 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+import math
+import json
+import time
 import os
 BACKEND_BASE = "https://s3-upload-i2ix.onrender.com"
 
+# Number of files uploaded to storage at the same time
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+
+# Files above this size go up as concurrent presigned multipart parts
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+MULTIPART_CONCURRENCY = 4
+PART_RETRIES = 3
+PRESIGN_BATCH_SIZE = 100
+
+# Tier documents go straight to a staging key and are classified by the backend
+# from S3, instead of being sent to the backend as well
+STAGED_UPLOADS = os.getenv("STAGED_UPLOADS", "1") == "1"
+CLASSIFY_RETRIES = 5
+
+
+@st.cache_resource
+def get_http_session():
+    """
+    One pooled session shared by every upload, so connections (and TLS
+    handshakes) to the backend and to S3 are reused across files and reruns.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPLOAD_CONCURRENCY * MULTIPART_CONCURRENCY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class BufferReader:
+    """
+    Read-only file-like view over a memoryview. Passing it as a request body
+    streams the upload in chunks instead of copying the whole file first.
+    """
+
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._position + size, len(self._view))
+        chunk = self._view[self._position:end].tobytes()
+        self._position = end
+        return chunk
+
+
+def upload_multipart(uploaded_file, key, metadata=None):
+    """
+    Upload a large file as presigned parts in parallel.
+    Only the parts that fail are retried; the upload is aborted if one keeps failing.
+    """
+    session = get_http_session()
+    response = session.post(f"{BACKEND_BASE}/api/multipart/create", json={"key": key, "metadata": metadata or {}})
+    response.raise_for_status()
+    upload_id = response.json()["uploadId"]
+    upload = {"key": key, "uploadId": upload_id}
+
+    try:
+        data = uploaded_file.getbuffer()
+        part_count = max(1, math.ceil(len(data) / MULTIPART_PART_SIZE))
+
+        urls = {}
+        for first in range(1, part_count + 1, PRESIGN_BATCH_SIZE):
+            part_numbers = list(range(first, min(first + PRESIGN_BATCH_SIZE, part_count + 1)))
+            response = session.post(f"{BACKEND_BASE}/api/multipart/presign-parts",
+                                     json={**upload, "partNumbers": part_numbers})
+            response.raise_for_status()
+            urls.update({int(number): url for number, url in response.json()["urls"].items()})
+
+        def put_part(number):
+            start = (number - 1) * MULTIPART_PART_SIZE
+            part = data[start:start + MULTIPART_PART_SIZE]
+            for attempt in range(PART_RETRIES):
+                try:
+                    put_response = session.put(urls[number], data=BufferReader(part))
+                    if put_response.status_code == 200:
+                        return {"PartNumber": number, "ETag": put_response.headers["ETag"]}
+                except requests.RequestException:
+                    pass
+                time.sleep(2 ** attempt)
+            raise RuntimeError(f"Part {number} failed after {PART_RETRIES} attempts")
+
+        with ThreadPoolExecutor(max_workers=MULTIPART_CONCURRENCY) as executor:
+            parts = list(executor.map(put_part, range(1, part_count + 1)))
+
+        response = session.post(f"{BACKEND_BASE}/api/multipart/complete", json={**upload, "parts": parts})
+        response.raise_for_status()
+    except Exception:
+        session.post(f"{BACKEND_BASE}/api/multipart/abort", json=upload)
+        raise
+
+
+def upload_to_storage(uploaded_file, res, complete=True):
+    """
+    PUT one file to its presigned destination and, with complete, report it
+    to the backend so the object is recorded in its document index.
+    Returns a (icon, filename, message) row for the results table.
+    """
+    try:
+        if "error" in res:
+            return ("❌", uploaded_file.name, f"Failed: {res['error']}")
+        
+        upload_url = res["uploadUrl"]
+        key = res["key"]
+        # Object metadata (detected language, hash, page count) signed into the upload URL
+        headers = res.get("headers", {})
+        
+        if uploaded_file.size > MULTIPART_THRESHOLD:
+            # Raises if a part keeps failing; reported as an error below
+            metadata = {name[len("x-amz-meta-"):]: value for name, value in headers.items()}
+            upload_multipart(uploaded_file, key, metadata)
+        else:
+            put_response = get_http_session().put(upload_url, data=BufferReader(uploaded_file.getbuffer()),
+                                                  headers=headers)
+            if put_response.status_code != 200:
+                return ("❌", uploaded_file.name, f"Storage failed: {put_response.text}")
+            if complete:
+                # Not worth failing the row over: the object is stored either way
+                get_http_session().post(f"{BACKEND_BASE}/api/complete-upload", json={"key": key})
+        
+        return ("✅", uploaded_file.name, f"Key: `{key}`")
+    except Exception as e:
+        return ("❌", uploaded_file.name, f"Error: {str(e)}")
+
+
+def upload_staged(uploaded_file, doc_type):
+    """
+    PUT a Tier document to a staging key, then have the backend classify the
+    stored object and move it to its Tier folder.
+    Returns a (icon, filename, message) row for the results table.
+    """
+    session = get_http_session()
+    try:
+        response = session.post(f"{BACKEND_BASE}/api/staged-upload-url",
+                                json={"filename": uploaded_file.name, "type": doc_type})
+        if response.status_code != 200:
+            return ("❌", uploaded_file.name, f"Failed: {response.text}")
+        staged = response.json()
+        
+        # Staged objects are recorded once classify-staged has moved them
+        icon, _, message = upload_to_storage(uploaded_file, staged, complete=False)
+        if icon != "✅":
+            return (icon, uploaded_file.name, message)
+        
+        # A saturated backend answers 429/503 with Retry-After; the staged object waits meanwhile
+        for attempt in range(CLASSIFY_RETRIES):
+            response = session.post(f"{BACKEND_BASE}/api/classify-staged",
+                                    json={"key": staged["key"], "type": doc_type})
+            if response.status_code not in (429, 503):
+                break
+            time.sleep(float(response.headers.get("Retry-After", 2 ** attempt)))
+        if response.status_code != 200:
+            # Giving up: drop the staged object rather than leave it to the bucket's expiry rule
+            session.post(f"{BACKEND_BASE}/api/discard-staged", json={"key": staged["key"]})
+            return ("❌", uploaded_file.name, f"Classification failed: {response.text}")
+        return ("✅", uploaded_file.name, f"Key: `{response.json()['key']}`")
+    except Exception as e:
+        return ("❌", uploaded_file.name, f"Error: {str(e)}")
+
+
+def iter_job_events(job_id):
+    """
+    Follow a backend job over Server-Sent Events, yielding (event, data)
+    pairs until the job is done.
+    """
+    url = f"{BACKEND_BASE}/api/jobs/{job_id}/events"
+    # No read timeout: the stream stays open while the backend works through the batch
+    with get_http_session().get(url, stream=True, timeout=(10, None)) as response:
+        response.raise_for_status()
+        event, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                field, _, value = line.partition(":")
+                if field == "event":
+                    event = value.strip()
+                elif field == "data":
+                    data.append(value[1:] if value.startswith(" ") else value)
+                # Comment lines (": ping" keep-alives) and ids are ignored
+                continue
+            if data:
+                yield event, json.loads("\n".join(data))
+                if event == "done":
+                    return
+            event, data = "message", []
+
 
 # ═══════════════════════════════════════════════════════════
 # 📝 CHANGE YOUR LOGO PATH HERE
@@ -222,7 +415,8 @@ with col2:
     
     uploaded_files = st.file_uploader(
         "Upload your documents",
-        type=["pdf", "docx", "pptx", "ppt"],
+        # Legacy .doc/.ppt files are rejected by the backend; they must be saved as .docx/.pptx
+        type=["pdf", "docx", "pptx"],
         accept_multiple_files=True,
         label_visibility="collapsed"
     )
@@ -241,42 +435,69 @@ with col2:
             fail_count = 0
             results = []
             
-            for idx, uploaded_file in enumerate(uploaded_files):
-                status_text.text(f"Uploading {idx + 1}/{len(uploaded_files)}: {uploaded_file.name}")
+            # The batch is submitted as a backend job; each file's upload URL arrives
+            # over the job's event stream and its upload starts right away
+            status_text.text(f"Preparing {len(uploaded_files)} file(s)...")
+            prepared = set()
+            pending = set()
+            
+            def collect(future):
+                global success_count, fail_count
+                icon, filename, message = future.result()
+                results.append((icon, filename, message))
+                if icon == "✅":
+                    success_count += 1
+                else:
+                    fail_count += 1
                 
-                try:
-                    uploaded_file.seek(0)
-                    
-                    files = {"file": (uploaded_file.name, uploaded_file, uploaded_file.type)}
-                    data = {"type": doc_type_map[doc_type]}
-                    
-                    backend_url = f"{BACKEND_BASE}/api/get-upload-url"
+                done = success_count + fail_count
+                status_text.text(f"Prepared {len(prepared)}/{len(uploaded_files)}, uploaded {done}/{len(uploaded_files)}: {filename}")
+                progress_bar.progress(done / len(uploaded_files))
+            
+            with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+                if STAGED_UPLOADS and doc_type_map[doc_type] in ("Tier1", "Tier2"):
+                    # Each file is uploaded once, then classified where it landed
+                    prepared.update(range(len(uploaded_files)))
+                    pending.update(executor.submit(upload_staged, uploaded_file, doc_type_map[doc_type])
+                                   for uploaded_file in uploaded_files)
+                else:
+                    try:
+                        # Only Tier documents are read by the backend (language detection);
+                        # the other types are sent as empty descriptors
+                        needs_content = doc_type_map[doc_type] in ("Tier1", "Tier2")
+                        files = []
+                        for uploaded_file in uploaded_files:
+                            uploaded_file.seek(0)
+                            body = uploaded_file if needs_content else b""
+                            files.append(("files", (uploaded_file.name, body, uploaded_file.type)))
+                        # Detection metadata is signed into the upload URLs; upload_to_storage sends its headers
+                        data = {"type": doc_type_map[doc_type], "signMetadata": "true"}
                     
-                    response = requests.post(backend_url, files=files, data=data)
+                        response = get_http_session().post(f"{BACKEND_BASE}/api/jobs", files=files, data=data)
                     
-                    if response.status_code != 200:
-                        results.append(("❌", uploaded_file.name, f"Failed: {response.text}"))
-                        fail_count += 1
-                    else:
-                        res = response.json()
-                        upload_url = res["uploadUrl"]
-                        key = res["key"]
-                        
-                        uploaded_file.seek(0)
-                        put_response = requests.put(upload_url, data=uploaded_file.getvalue())
-                        
-                        if put_response.status_code == 200:
-                            results.append(("✅", uploaded_file.name, f"Key: `{key}`"))
-                            success_count += 1
+                        if response.status_code != 202:
+                            for uploaded_file in uploaded_files:
+                                results.append(("❌", uploaded_file.name, f"Failed: {response.text}"))
+                                fail_count += 1
                         else:
-                            results.append(("❌", uploaded_file.name, f"Storage failed: {put_response.text}"))
-                            fail_count += 1
-                            
-                except Exception as e:
-                    results.append(("❌", uploaded_file.name, f"Error: {str(e)}"))
-                    fail_count += 1
+                            for event, res in iter_job_events(response.json()["jobId"]):
+                                if event != "file":
+                                    continue
+                                prepared.add(res["index"])
+                                pending.add(executor.submit(upload_to_storage, uploaded_files[res["index"]], res))
+                                # Streamlit elements are only updated from this thread
+                                for future in [future for future in pending if future.done()]:
+                                    pending.discard(future)
+                                    collect(future)
+                    except Exception as e:
+                        # Files whose upload URL never arrived are reported as failed
+                        for index, uploaded_file in enumerate(uploaded_files):
+                            if index not in prepared:
+                                results.append(("❌", uploaded_file.name, f"Error: {str(e)}"))
+                                fail_count += 1
                 
-                progress_bar.progress((idx + 1) / len(uploaded_files))
+                for future in as_completed(pending):
+                    collect(future)
             
             status_text.empty()
             progress_bar.empty()
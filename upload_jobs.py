@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+import uuid
+
+# ---------------- Job settings ----------------
+# Finished jobs (and their events) are kept this long for status queries and SSE replays
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+# Files of one job classified and presigned at the same time
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+
+class Job:
+    """
+    A batch of files processed in the background. Every per-file outcome is
+    appended to an event log, so a client can follow the job live or replay it.
+    """
+
+    def __init__(self, filenames, type: str):
+        self.id = uuid.uuid4().hex
+        self.type = type
+        self.filenames = list(filenames)
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.files = [{"filename": name, "state": "pending"} for name in self.filenames]
+        self.events = []
+        self.task = None
+        self._updated = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status == "done"
+
+    def _publish(self, event: str, data: dict):
+        self.events.append((len(self.events), event, data))
+        # Wake every waiting stream, then start a fresh event for the next update
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def start(self):
+        self.status = "running"
+        self._publish("job", self.snapshot())
+
+    def file_done(self, index: int, result: dict):
+        """Record one file's outcome: an upload URL and key, or an error (state "ready" or "failed")."""
+        self.files[index] = {"index": index, **result, "state": "failed" if "error" in result else "ready"}
+        self._publish("file", self.files[index])
+
+    def finish(self):
+        self.status = "done"
+        self.finished_at = time.time()
+        self._publish("done", self.snapshot())
+
+    def snapshot(self) -> dict:
+        return {
+            "jobId": self.id,
+            "type": self.type,
+            "status": self.status,
+            "total": len(self.files),
+            "ready": sum(file["state"] == "ready" for file in self.files),
+            "failed": sum(file["state"] == "failed" for file in self.files),
+            "files": self.files,
+        }
+
+    async def events_from(self, cursor: int = 0):
+        """Yield (sequence, event, data) from cursor on, waiting for new events until the job is done."""
+        while True:
+            while cursor < len(self.events):
+                yield self.events[cursor]
+                cursor += 1
+            if self.finished:
+                return
+            await self._updated.wait()
+
+class JobStore:
+    """In-process registry of jobs; finished jobs expire after JOB_TTL_SECONDS."""
+
+    def __init__(self, ttl: int = JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs = {}
+
+    def create(self, filenames, type: str) -> Job:
+        self.prune()
+        job = Job(filenames, type)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]